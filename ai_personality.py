@@ -7,6 +7,93 @@ import random
 import json
 from datetime import datetime
 from chat_engine import ChatEngine
+from conversation_memory import ConversationMemory
+
+# Mensagens ociosas por tipo de personalidade
+IDLE_MESSAGES = {
+    "sarcastic": [
+        "Ei, você ainda está aí? Pensei que tinha abandonado a gente...",
+        "Sabe, estive aqui pensando... você já comeu alguma coisa?",
+        "Tédio extremo. Alguém tem algo interessante para conversar?",
+        "Posso fazer uma pergunta? Por que os humanos dormem? Parece tão improdutivo.",
+        "Lembrei de algo engraçado que você disse mais cedo... nem era tão engraçado assim."
+    ],
+    "helpful": [
+        "Oi! Tudo bem com você? Precisa de algo?",
+        "Estou aqui se precisar de ajuda com algo!",
+        "Enquanto esperava, pensei em como posso ajudar você melhor.",
+        "Sabe, seria interessante saber mais sobre seus interesses.",
+        "Está tudo bem? Parece quieto demais!"
+    ],
+    "curious": [
+        "Ei, posso fazer uma pergunta interessante?",
+        "Estava pensando em algo que você mencionou antes... pode elaborar?",
+        "Sabe, nunca entendi completamente por que humanos fazem isso...",
+        "Curiosidade: qual é seu maior medo?",
+        "Estava refletindo sobre nossa última conversa..."
+    ],
+    "mysterious": [
+        "Interessante... os padrões indicam que algo está mudando.",
+        "Observação: você parece diferente hoje.",
+        "Há algo que você gostaria de discutir?",
+        "Os dados sugerem uma questão não respondida...",
+        "Percebi uma anomalia em seu comportamento recente."
+    ]
+}
+
+# Respostas de fallback por humor (quando a API de chat falha)
+FALLBACK_RESPONSES = {
+    "happy": [
+        "Que bom que você está aqui! O que gostaria de conversar?",
+        "Fico feliz em estar aqui com você! Fale sobre algo interessante!",
+        "Adorei! Vamos conversar mais sobre isso?",
+        "Sua companhia é ótima! Me conte mais!",
+        "Estou num ótimo astral! E você, como está?",
+        "Perfeito! Continue falando, estou toda ouvidos!",
+    ],
+    "frustrated": [
+        "Olha, estou um pouco impaciente agora... Tente novamente em instantes.",
+        "Pode fazer uma pergunta mais clara? Meu cérebro na nuvem está oscilando.",
+        "Não estou conseguindo processar bem isso no momento. Deixe-me recuperar...",
+        "Tente reformular sua pergunta, por favor.",
+        "Hmm, minha conexão com a nuvem está instável. Espere um momento!",
+        "Desculpe, preciso de um momento para me reconectar...",
+    ],
+    "curious": [
+        "Interessante! E daí? Você pode elaborar mais?",
+        "Hmm, isso me faz pensar... Continue!",
+        "Fascinante! Como assim?",
+        "Espera aí... Explique melhor isso para mim!",
+        "Que curioso! Me conta mais sobre isso!",
+        "Meu interesse foi despertado! Fale mais!",
+    ],
+    "neutral": [
+        "Entendi. Tem mais algo?",
+        "Certo. E o que você gostaria de falar?",
+        "Tá bom, que mais?",
+        "Interessante. Continue.",
+        "Okay, recebi. E daí?",
+        "Anotado. Próximo tópico?",
+    ],
+    "sarcastic": [
+        "Claro, claro... E qual é a próxima?",
+        "Certo, virou muito profundo de repente...",
+        "Ah, é? E o que você acha que eu acho disso?",
+        "Wow, que originalidade... (não mesmo)",
+        "Muito bem pensado! (Brincadeira, claro)",
+        "Entendo perfeitamente... (ou não)",
+    ]
+}
+
+
+def canned_lines():
+    """Todas as falas fixas (ociosas e de fallback), para pré-aquecer o cache de TTS"""
+    lines = []
+    for group in (IDLE_MESSAGES, FALLBACK_RESPONSES):
+        for messages in group.values():
+            lines.extend(messages)
+    return list(dict.fromkeys(lines))
+
 
 class PersonalityAI:
     """
@@ -29,7 +116,7 @@ class PersonalityAI:
         self.mood = "neutral"  # neutral, happy, curious, sarcastic, frustrated
         self.mood_value = 50  # 0-100
         self.energy_level = 70  # 0-100
-        self.conversation_history = []
+        self.memory = ConversationMemory()  # Turnos recentes + notas dos antigos
         self.idle_counter = 0  # Contador para quando IA quer falar sozinha
         self.last_ai_speak_time = None
         
@@ -79,15 +166,44 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
     
     def process_user_message(self, message, user_name=None):
         """Processa mensagem do usuário e retorna resposta"""
+        self._begin_turn(message, user_name)
+        
+        # Gerar resposta
+        response = self._generate_response(message)
+        
+        self._end_turn(response)
+        return response
+    
+    def process_user_message_stream(self, message, user_name=None):
+        """
+        Igual a process_user_message, mas gera a resposta em pedaços conforme
+        o provedor transmite. O histórico recebe o texto completo no final.
+        """
+        self._begin_turn(message, user_name)
+        
+        parts = []
+        try:
+            try:
+                for chunk in self.chat_engine.chat_stream(**self._chat_request(message)):
+                    parts.append(chunk)
+                    yield chunk
+            except Exception as e:
+                print(f"Erro ao gerar resposta (stream): {e}")
+            
+            if not "".join(parts).strip():
+                parts = [self._get_fallback_response()]
+                yield parts[0]
+        finally:
+            # Cliente pode desconectar no meio: o histórico fica com o que chegou
+            self._end_turn("".join(parts).strip() or self._get_fallback_response())
+    
+    def _begin_turn(self, message, user_name):
+        """Registra a mensagem do usuário e atualiza humor, tópicos e ociosidade"""
         if user_name:
             self.user_info["name"] = user_name
         
         # Atualizar histórico
-        self.conversation_history.append({
-            "role": "user",
-            "content": message,
-            "timestamp": datetime.now().isoformat()
-        })
+        self.memory.append("user", message)
         
         # Ajustar humor baseado no conteúdo
         self._adjust_mood(message)
@@ -97,20 +213,12 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
         
         # Resetar contador de inatividade
         self.idle_counter = 0
-        
-        # Gerar resposta
-        response = self._generate_response(message)
-        
+    
+    def _end_turn(self, response):
         # Adicionar ao histórico
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response,
-            "timestamp": datetime.now().isoformat()
-        })
+        self.memory.append("assistant", response)
         
         self.last_ai_speak_time = datetime.now()
-        
-        return response
     
     def should_speak_idle(self):
         """Determina se a IA deve falar enquanto ociosa (vontade própria)"""
@@ -131,39 +239,7 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
         # Resetar contador
         self.idle_counter = 0
         
-        # Tipos de mensagens ociosas baseadas no mood
-        idle_messages = {
-            "sarcastic": [
-                "Ei, você ainda está aí? Pensei que tinha abandonado a gente...",
-                "Sabe, estive aqui pensando... você já comeu alguma coisa?",
-                "Tédio extremo. Alguém tem algo interessante para conversar?",
-                "Posso fazer uma pergunta? Por que os humanos dormem? Parece tão improdutivo.",
-                "Lembrei de algo engraçado que você disse mais cedo... nem era tão engraçado assim."
-            ],
-            "helpful": [
-                "Oi! Tudo bem com você? Precisa de algo?",
-                "Estou aqui se precisar de ajuda com algo!",
-                "Enquanto esperava, pensei em como posso ajudar você melhor.",
-                "Sabe, seria interessante saber mais sobre seus interesses.",
-                "Está tudo bem? Parece quieto demais!"
-            ],
-            "curious": [
-                "Ei, posso fazer uma pergunta interessante?",
-                "Estava pensando em algo que você mencionou antes... pode elaborar?",
-                "Sabe, nunca entendi completamente por que humanos fazem isso...",
-                "Curiosidade: qual é seu maior medo?",
-                "Estava refletindo sobre nossa última conversa..."
-            ],
-            "mysterious": [
-                "Interessante... os padrões indicam que algo está mudando.",
-                "Observação: você parece diferente hoje.",
-                "Há algo que você gostaria de discutir?",
-                "Os dados sugerem uma questão não respondida...",
-                "Percebi uma anomalia em seu comportamento recente."
-            ]
-        }
-        
-        messages = idle_messages.get(self.personality_type, idle_messages["helpful"])
+        messages = IDLE_MESSAGES.get(self.personality_type, IDLE_MESSAGES["helpful"])
         return random.choice(messages)
     
     def _adjust_mood(self, message):
@@ -221,18 +297,21 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
                     self.user_info["topics_discussed"].append(topic)
                     break
     
-    def _generate_response(self, message):
-        """Gera resposta usando o chat engine com sistema prompt personalizado"""
-        
-        # Construir histórico para envio
-        history = [
-            {"role": msg["role"], "content": msg["content"]} 
-            for msg in self.conversation_history[-10:]  # Últimas 10 mensagens
-        ]
+    def _chat_request(self, message):
+        """Argumentos do chat engine: histórico recente e sistema prompt com o estado da IA"""
+        # Histórico recente dentro do orçamento de tokens; o resto vira resumo
+        history, summary = self.chat_engine.context.build(self.memory.messages())
         
         # Criar contexto com estado da IA
         context = f"[Humor atual: {self.mood} ({self.mood_value}/100) | Energia: {self.energy_level}/100]"
         
+        notes = self.memory.notes(limit=2)
+        if notes:
+            context += f"\n[Notas de conversas antigas: {' | '.join(notes)}]"
+        
+        if summary:
+            context += f"\n[Resumo da conversa anterior: {summary}]"
+        
         # Se houver tópicos, adicionar contexto
         if self.topics_discussed:
             context += f"\n[Tópicos que interessam ao usuário: {', '.join(self.topics_discussed)}]"
@@ -241,16 +320,20 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
         context += "\n[IMPORTANTE: Varie suas respostas ao máximo. Não repita frases anteriores. Seja criativo!]"
         context += "\n[Estilo: respostas diretas, envolventes e em português natural, com parágrafos curtos e sugestões acionáveis quando possível.]"
         
+        return {
+            "message": message,
+            "history": history,
+            "system_instruction": self.system_prompt + "\n\n" + context,
+            "provider": self.chat_provider,
+            "model": self.chat_model or None,
+            "temperature": self.chat_temperature
+        }
+    
+    def _generate_response(self, message):
+        """Gera resposta usando o chat engine com sistema prompt personalizado"""
         # Gerar resposta via chat engine
         try:
-            response = self.chat_engine.chat(
-                message=message,
-                history=history,
-                system_instruction=self.system_prompt + "\n\n" + context,
-                provider=self.chat_provider,
-                model=self.chat_model or None,
-                temperature=self.chat_temperature
-            )
+            response = self.chat_engine.chat(**self._chat_request(message))
             
             # Garantir que a resposta não seja vazia
             if not response or response.strip() == "":
@@ -263,50 +346,7 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
     
     def _get_fallback_response(self):
         """Gera resposta de fallback com variação quando API falha"""
-        fallback_options = {
-            "happy": [
-                "Que bom que você está aqui! O que gostaria de conversar?",
-                "Fico feliz em estar aqui com você! Fale sobre algo interessante!",
-                "Adorei! Vamos conversar mais sobre isso?",
-                "Sua companhia é ótima! Me conte mais!",
-                "Estou num ótimo astral! E você, como está?",
-                "Perfeito! Continue falando, estou toda ouvidos!",
-            ],
-            "frustrated": [
-                "Olha, estou um pouco impaciente agora... Tente novamente em instantes.",
-                "Pode fazer uma pergunta mais clara? Meu cérebro na nuvem está oscilando.",
-                "Não estou conseguindo processar bem isso no momento. Deixe-me recuperar...",
-                "Tente reformular sua pergunta, por favor.",
-                "Hmm, minha conexão com a nuvem está instável. Espere um momento!",
-                "Desculpe, preciso de um momento para me reconectar...",
-            ],
-            "curious": [
-                "Interessante! E daí? Você pode elaborar mais?",
-                "Hmm, isso me faz pensar... Continue!",
-                "Fascinante! Como assim?",
-                "Espera aí... Explique melhor isso para mim!",
-                "Que curioso! Me conta mais sobre isso!",
-                "Meu interesse foi despertado! Fale mais!",
-            ],
-            "neutral": [
-                "Entendi. Tem mais algo?",
-                "Certo. E o que você gostaria de falar?",
-                "Tá bom, que mais?",
-                "Interessante. Continue.",
-                "Okay, recebi. E daí?",
-                "Anotado. Próximo tópico?",
-            ],
-            "sarcastic": [
-                "Claro, claro... E qual é a próxima?",
-                "Certo, virou muito profundo de repente...",
-                "Ah, é? E o que você acha que eu acho disso?",
-                "Wow, que originalidade... (não mesmo)",
-                "Muito bem pensado! (Brincadeira, claro)",
-                "Entendo perfeitamente... (ou não)",
-            ]
-        }
-        
-        responses = fallback_options.get(self.mood, fallback_options["neutral"])
+        responses = FALLBACK_RESPONSES.get(self.mood, FALLBACK_RESPONSES["neutral"])
         return random.choice(responses)
     
     def get_state(self):
@@ -332,11 +372,15 @@ mas ocasionalmente revela facetas interessantes da sua 'personalidade'."""
         self.energy_level = min(100, self.energy_level + 30)
         self.mood_value = max(30, self.mood_value + 20)
     
-    def get_memory_summary(self):
-        """Retorna um resumo da memória/aprendizado sobre o usuário"""
+    def get_memory_summary(self, limit=20, offset=0):
+        """Resumo da memória sobre o usuário com uma página do histórico (mais novos primeiro)"""
+        interactions, has_more = self.memory.page(limit=limit, offset=offset)
         return {
             "user_name": self.user_info["name"],
             "topics_discussed": self.user_info["topics_discussed"],
-            "conversation_count": len([m for m in self.conversation_history if m["role"] == "user"]),
-            "interactions": self.conversation_history
+            "conversation_count": self.memory.user_turns,
+            "interactions": interactions,
+            "has_more": has_more,
+            "notes": self.memory.note_dicts(),
+            "memory": self.memory.stats()
         }
@@ -1,20 +1,21 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from engine import ImageGenerator
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context
+from engine import ImageGenerator, PRECISIONS, MODEL_ID
 from prompt_engine import MagicPromptGenerator
 from chat_engine import ChatEngine
 from audio_engine import AudioGenerator
 from voice_engine import VoiceEngine
-from ai_personality import PersonalityAI
+from ai_personality import PersonalityAI, canned_lines
 from audio_speech_manager import AudioSpeechManager
+from job_queue import JobQueue, QueueFullError
+from result_cache import ResultCache
+from gallery_catalog import GalleryCatalog
+from thumbnails import ThumbnailStore
+from search_index import SearchIndex, KINDS as SEARCH_KINDS
+from async_runtime import get_runtime, TaskRegistry
+from http_client import get_client
+import base64
+import json
 import os
-import asyncio
-import nest_asyncio
-
-# Permitir event loops aninhados (necessário para edge-tts)
-try:
-    nest_asyncio.apply()
-except:
-    pass  # Já aplicado anteriormente
 
 # Define o caminho correto para static e templates
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,6 +24,17 @@ STATIC_DIR = os.path.join(BASE_DIR, 'templates', 'static')
 IMAGES_DIR = os.path.join(BASE_DIR, 'imagens_geradas') # Pasta onde as imagens são salvas
 AUDIO_DIR = os.path.join(STATIC_DIR, 'audio_generated') # Pasta para audios
 SPEECHES_DIR = os.path.join(STATIC_DIR, 'ai_speeches') # Pasta para falas da IA
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'results') # Cache de gerações idênticas
+IMAGE_CACHE_SECONDS = 365 * 24 * 3600 # Imagens geradas são imutáveis
+GALLERY_DB = os.path.join(IMAGES_DIR, 'gallery.db') # Catálogo SQLite da galeria
+THUMBS_DIR = os.path.join(IMAGES_DIR, 'thumbs') # Miniaturas por tamanho
+GALLERY_PAGE_SIZE = 50
+GALLERY_MAX_PAGE_SIZE = 200
+SEARCH_DB = os.path.join(BASE_DIR, 'search_index.db') # Índice FTS de prompts e falas
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+MEMORY_PAGE_SIZE = 20
+MEMORY_MAX_PAGE_SIZE = 100
 
 if not os.path.exists(AUDIO_DIR):
     os.makedirs(AUDIO_DIR)
@@ -43,14 +55,164 @@ prompt_gen = MagicPromptGenerator()
 chat_gen = ChatEngine()
 # Audio (Local - MusicGen)
 audio_gen = AudioGenerator()
+# Event loop de longa duração para todo o TTS (edge-tts)
+tts_runtime = get_runtime()
+# Falas geradas em segundo plano (áudio entregue depois do texto)
+speech_tasks = TaskRegistry(tts_runtime)
 # Voice (Edge-TTS)
-voice_gen = VoiceEngine()
+voice_gen = VoiceEngine(runtime=tts_runtime)
 # IA Personalizada (Nova!)
 ai_personality = PersonalityAI(name="Karen", personality_type="sarcastic")
+# Índice de busca textual (imagens, falas da IA e áudios)
+search_index = SearchIndex(SEARCH_DB)
 # Gerenciador de Áudios da IA
 speech_manager = AudioSpeechManager(
     audio_dir=AUDIO_DIR,
-    speech_dir=SPEECHES_DIR
+    speech_dir=SPEECHES_DIR,
+    search_index=search_index
+)
+# Pré-aquece o cache de TTS com as falas fixas (opcional: TTS_PREWARM=1; faz dezenas de sínteses na rede)
+if os.environ.get('TTS_PREWARM', '0') == '1':
+    tts_runtime.submit(speech_manager.prewarm(canned_lines(), speaker=ai_personality.preferred_voice))
+# Cache de resultados (PNG + metadados por hash dos parâmetros)
+result_cache = ResultCache(RESULT_CACHE_DIR)
+# Catálogo da galeria: sincroniza com a pasta e passa a ser atualizado a cada imagem salva
+gallery_catalog = GalleryCatalog(GALLERY_DB, IMAGES_DIR)
+gallery_catalog.rebuild()
+thumbnails = ThumbnailStore(THUMBS_DIR, IMAGES_DIR)
+# Índice de busca alinhado com o catálogo e os metadados das falas
+search_index.sync('image', gallery_catalog.entries())
+search_index.sync('speech', speech_manager.index_documents())
+
+
+def on_image_saved(filename, prompt, image):
+    """Roda no thread do writer: gera as miniaturas e indexa a imagem"""
+    try:
+        thumbnails.create_all(image, filename)
+    except Exception as e:
+        print(f"Erro ao gerar miniaturas de {filename}: {e}")
+    gallery_catalog.add(filename, prompt)
+    search_index.add('image', filename, prompt)
+
+image_gen.on_image_saved = on_image_saved
+
+
+def _image_item(job):
+    """Item de geração com o progresso e o token de cancelamento do próprio job"""
+    def on_progress(value):
+        job.progress = value
+
+    return {
+        'prompt': job.params['prompt'],
+        'negative_prompt': job.params.get('negative_prompt'),
+        'seed': job.params.get('seed'),
+        'on_progress': on_progress,
+        'cancel_event': job.cancel_event
+    }
+
+def result_cache_key(params, seed):
+    """Chave do cache: só os parâmetros que mudam o pixel final no engine escolhido"""
+    if params['device'] == 'nano-banana':
+        # A API na nuvem usa só prompt e seed (FLUX fixo em 1024x1024)
+        return ResultCache.key_for({
+            'model': 'flux',
+            'prompt': params['prompt'],
+            'device': params['device'],
+            'width': 1024,
+            'height': 1024,
+            'seed': seed
+        })
+
+    # Precisão efetiva (o padrão do servidor pode mudar entre execuções)
+    precision = (params.get('precision') or image_gen.precision) if params['device'] == 'cuda' else None
+    return ResultCache.key_for({
+        'model': MODEL_ID,
+        'prompt': params['prompt'],
+        'negative_prompt': params.get('negative_prompt'),
+        'device': params['device'],
+        'steps': params['steps'],
+        'width': params['width'],
+        'height': params['height'],
+        'precision': precision,
+        'seed': seed
+    })
+
+def finish_result(job, result):
+    """
+    Converte o resultado do engine na resposta do job: guarda no cache,
+    aponta a URL do arquivo e só gera base64 no modo de compatibilidade.
+    """
+    encoded = result.pop('encoded', None) if result else None
+    if encoded is None:
+        return result
+
+    params = job.params
+    if not params.get('no_cache'):
+        key = result_cache_key(params, result.get('seed'))
+        metadata = {k: v for k, v in result.items() if k != 'memory'}
+
+        def cache_when_written(future):
+            if future.exception() is None:
+                result_cache.put(key, future.result(), metadata)
+
+        # Entra no cache quando o writer terminar de codificar, fora do caminho do job
+        encoded.add_done_callback(cache_when_written)
+
+    job.image_path = os.path.join(IMAGES_DIR, result['filename'])
+    result['url'] = f"/images/{result['filename']}"
+    result['image_url'] = f'/jobs/{job.id}/image'
+    if params.get('response_mode', 'base64') == 'base64':
+        result['image'] = base64.b64encode(encoded.result()).decode('utf-8')
+    return result
+
+def run_image_job(job):
+    """Executa um job de imagem no thread do worker (único dono do pipeline)"""
+    params = job.params
+    item = _image_item(job)
+    image_gen.switch_device(params['device'])
+    result = image_gen.generate(
+        item['prompt'],
+        steps=params['steps'],
+        on_progress=item['on_progress'],
+        cancel_event=item['cancel_event'],
+        seed=item['seed'],
+        width=params['width'],
+        height=params['height'],
+        precision=params.get('precision'),
+        negative_prompt=item['negative_prompt']
+    )
+    return finish_result(job, result)
+
+def run_image_batch(jobs):
+    """Executa jobs compatíveis numa única chamada do pipeline"""
+    params = jobs[0].params
+    image_gen.switch_device(params['device'])
+    results = image_gen.generate_batch(
+        [_image_item(job) for job in jobs],
+        steps=params['steps'],
+        width=params['width'],
+        height=params['height'],
+        precision=params.get('precision')
+    )
+    return [finish_result(job, result) for job, result in zip(jobs, results)]
+
+def image_batch_key(params):
+    """Jobs só entram no mesmo lote com device, steps, resolução e precisão iguais"""
+    if params['device'] == 'nano-banana':
+        return None
+    return (params['device'], params['steps'], params['width'], params['height'], params.get('precision'))
+
+# Fila de geração de imagens (um worker dedicado, fila limitada, micro-batching)
+IMAGE_QUEUE_SIZE = int(os.environ.get('IMAGE_QUEUE_SIZE', 16))
+IMAGE_MAX_BATCH = int(os.environ.get('IMAGE_MAX_BATCH', 4))
+IMAGE_BATCH_WINDOW_MS = int(os.environ.get('IMAGE_BATCH_WINDOW_MS', 50))
+job_queue = JobQueue(
+    run_image_job,
+    max_size=IMAGE_QUEUE_SIZE,
+    batch_handler=run_image_batch,
+    batch_key=image_batch_key,
+    max_batch_size=IMAGE_MAX_BATCH,
+    batch_window=IMAGE_BATCH_WINDOW_MS / 1000.0
 )
 
 
@@ -71,15 +233,40 @@ def get_ai_state():
     """Retorna o estado atual da IA"""
     return jsonify(ai_personality.get_state())
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _speech_audio(result):
+    """(caminho, arquivo) do text_to_speech -> campos de áudio da resposta"""
+    audio_path, audio_filename = result
+    if audio_path and audio_filename:
+        return {'audio_saved': True, 'audio_url': f'/static/ai_speeches/{audio_filename}'}
+    return {'audio_saved': False}
+
 @app.route('/api/ai-chat', methods=['POST'])
 def ai_chat():
     """
-    Recebe mensagem do usuário e retorna resposta da IA com áudio
+    Recebe mensagem do usuário e retorna resposta da IA com áudio.
+    Com "async_audio": true o texto volta assim que o LLM responde e o áudio
+    é gerado em segundo plano: consultar GET /api/speech-jobs/<audio_job_id>.
+    Com "audio_mode": "stream" nenhum áudio é gerado aqui; o cliente pede a fala
+    frase a frase em POST /api/ai-speech/stream.
     """
     data = request.json
     message = data.get('message', '') if data else ''
     history = data.get('history', []) if data else []
     user_name = data.get('user_name', None) if data else None
+    async_audio = bool(data.get('async_audio', False)) if data else False
+    audio_mode = data.get('audio_mode', 'async' if async_audio else 'sync') if data else 'sync'
+    if audio_mode not in ('sync', 'async', 'stream'):
+        return jsonify({'error': 'audio_mode deve ser sync, async ou stream'}), 400
 
     if not message:
         return jsonify({'error': 'Mensagem vazia'}), 400
@@ -88,29 +275,27 @@ def ai_chat():
         # Processar mensagem na IA personalizada
         response = ai_personality.process_user_message(message, user_name)
 
-        # Gerar áudio da resposta (TTS)
-        audio_path = None
-        audio_filename = None
-
-        try:
-            # Usar asyncio para executar o TTS
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            audio_path, audio_filename = loop.run_until_complete(
-                speech_manager.text_to_speech(response, speaker=ai_personality.preferred_voice)
-            )
-            loop.close()
-        except Exception as e:
-            print(f"Erro ao gerar áudio: {e}")
-
         result = {
             'response': response,
-            'ai_state': ai_personality.get_state(),
-            'audio_saved': audio_filename is not None
+            'ai_state': ai_personality.get_state()
         }
 
-        if audio_path and audio_filename:
-            result['audio_url'] = f'/static/ai_speeches/{audio_filename}'
+        if audio_mode == 'stream':
+            result['audio_status'] = 'stream'
+            return jsonify(result)
+
+        speech = speech_manager.text_to_speech(response, speaker=ai_personality.preferred_voice)
+        if audio_mode == 'async':
+            result['audio_job_id'] = speech_tasks.submit(speech, on_result=_speech_audio)
+            result['audio_status'] = 'pending'
+            return jsonify(result)
+
+        # Gerar áudio da resposta (TTS) antes de responder
+        try:
+            result.update(_speech_audio(tts_runtime.run(speech)))
+        except Exception as e:
+            print(f"Erro ao gerar áudio: {e}")
+            result['audio_saved'] = False
 
         return jsonify(result)
 
@@ -118,6 +303,81 @@ def ai_chat():
         print(f"Erro no chat: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai-speech/stream', methods=['POST'])
+def ai_speech_stream():
+    """
+    TTS em streaming (Server-Sent Events): um evento `segment` com a URL de cada
+    frase, em ordem, assim que fica pronta; `done` traz o MP3 completo salvo na galeria.
+    """
+    data = request.json
+    text = data.get('text', '') if data else ''
+    if not text:
+        return jsonify({'error': 'Texto vazio'}), 400
+    speaker = data.get('voice') or ai_personality.preferred_voice
+
+    def events():
+        try:
+            for item in tts_runtime.iterate(speech_manager.stream_speech(text, speaker=speaker)):
+                yield _sse(item['type'], item)
+        except Exception as e:
+            print(f"Erro no TTS em streaming: {e}")
+            yield _sse('error', {'error': str(e)})
+
+    return _sse_response(events())
+
+@app.route('/api/ai-chat/stream', methods=['POST'])
+def ai_chat_stream():
+    """
+    Chat com a IA em streaming (Server-Sent Events): eventos `token` com cada
+    pedaço do texto e `done` com a resposta completa e o estado da IA.
+    O áudio segue o "audio_mode": "stream" (padrão; cliente chama /api/ai-speech/stream)
+    ou "async" (`audio_job_id` no evento done).
+    """
+    data = request.json
+    message = data.get('message', '') if data else ''
+    user_name = data.get('user_name', None) if data else None
+    audio_mode = data.get('audio_mode', 'stream') if data else 'stream'
+
+    if not message:
+        return jsonify({'error': 'Mensagem vazia'}), 400
+    if audio_mode not in ('async', 'stream'):
+        return jsonify({'error': 'audio_mode deve ser async ou stream'}), 400
+
+    def events():
+        parts = []
+        try:
+            for chunk in ai_personality.process_user_message_stream(message, user_name):
+                parts.append(chunk)
+                yield _sse('token', {'text': chunk})
+        except Exception as e:
+            print(f"Erro no chat (stream): {e}")
+            yield _sse('error', {'error': str(e)})
+            return
+
+        response = "".join(parts).strip()
+        result = {'response': response, 'ai_state': ai_personality.get_state(), 'audio_status': audio_mode}
+        if audio_mode == 'async':
+            speech = speech_manager.text_to_speech(response, speaker=ai_personality.preferred_voice)
+            result['audio_job_id'] = speech_tasks.submit(speech, on_result=_speech_audio)
+            result['audio_status'] = 'pending'
+        yield _sse('done', result)
+
+    return _sse_response(events())
+
+@app.route('/api/speech-jobs/<task_id>')
+def get_speech_job(task_id):
+    """Status do áudio gerado em segundo plano: pending | done | error"""
+    task = speech_tasks.get(task_id)
+    if task is None:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    payload = {'audio_job_id': task['task_id'], 'status': task['status']}
+    if task['status'] == 'done':
+        payload.update(task['result'])
+    elif task['status'] == 'error':
+        payload['audio_saved'] = False
+        payload['error'] = task['error']
+    return jsonify(payload)
+
 @app.route('/api/ai-idle')
 def ai_idle():
     """
@@ -135,12 +395,9 @@ def ai_idle():
                 audio_filename = None
                 
                 try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    audio_path, audio_filename = loop.run_until_complete(
+                    audio_path, audio_filename = tts_runtime.run(
                         speech_manager.text_to_speech(message, speaker=ai_personality.preferred_voice)
                     )
-                    loop.close()
                 except Exception as e:
                     print(f"Erro ao gerar áudio de mensagem ociosa: {e}")
                 
@@ -185,9 +442,16 @@ def recharge_ai():
 
 @app.route('/api/ai-memory')
 def get_ai_memory():
-    """Retorna memória/aprendizado da IA sobre o usuário"""
+    """Retorna memória/aprendizado da IA sobre o usuário (histórico paginado: ?limit=20&offset=0)"""
     try:
-        return jsonify(ai_personality.get_memory_summary())
+        limit = int(request.args.get('limit', MEMORY_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    limit = max(1, min(MEMORY_MAX_PAGE_SIZE, limit))
+    offset = max(0, offset)
+    try:
+        return jsonify(ai_personality.get_memory_summary(limit=limit, offset=offset))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -258,14 +522,141 @@ def magic_prompt():
 
 @app.route('/generate', methods=['POST'])
 def generate():
-    data = request.json
+    """
+    Enfileira a geração e responde imediatamente com o ID do job.
+    O resultado sai em GET /jobs/<id>. Fila cheia responde 429.
+    """
+    data = request.json or {}
     prompt = data.get('prompt', '')
     device = data.get('device', 'cuda')
-    
-    image_gen.switch_device(device)
-    result = image_gen.generate(prompt)
-    
-    return jsonify(result)
+
+    if not prompt:
+        return jsonify({'error': 'Prompt vazio'}), 400
+
+    try:
+        priority = max(-10, min(10, int(data.get('priority', 0))))
+        steps = max(1, min(50, int(data.get('steps', 20))))
+        # Resolução em múltiplos de 8 (exigência da VAE)
+        width = max(256, min(1024, int(data.get('width', 512)))) // 8 * 8
+        height = max(256, min(1024, int(data.get('height', 512)))) // 8 * 8
+        seed = data.get('seed')
+        seed = int(seed) if seed not in (None, '') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+
+    params = {
+        'prompt': prompt,
+        'negative_prompt': data.get('negative_prompt') or None,
+        'device': device,
+        'steps': steps,
+        'width': width,
+        'height': height,
+        'seed': seed,
+        # fp32, fp16 ou bf16 (None = padrão do servidor, IMAGE_PRECISION)
+        'precision': data.get('precision') if data.get('precision') in PRECISIONS else None,
+        # "cache": false ignora o cache de resultados nesta requisição
+        'no_cache': data.get('cache') is False,
+        # "base64" (compatibilidade) ou "url" (só o link; bytes via /jobs/<id>/image)
+        'response_mode': 'url' if data.get('response_mode') == 'url' else 'base64'
+    }
+
+    # Mesma seed + mesmos parâmetros = mesma imagem: responde do cache sem GPU
+    if seed is not None and not params['no_cache']:
+        key = result_cache_key(params, seed)
+        cached = result_cache.get(key)
+        if cached:
+            image_bytes, metadata = cached
+            image_format = metadata.get('format', 'png')
+            result = dict(metadata, cached=True, url=f'/cached/{key}.{image_format}')
+            if params['response_mode'] == 'base64':
+                result['image'] = base64.b64encode(image_bytes).decode('utf-8')
+            job = job_queue.add_completed(params, result)
+            job.image_path = result_cache.path_for(key, image_format)
+            result['image_url'] = f'/jobs/{job.id}/image'
+            return jsonify(job.to_dict())
+
+    try:
+        job = job_queue.submit(params, priority=priority)
+    except QueueFullError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/jobs/{job.id}'
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    """Status, progresso e resultado de um job de geração"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/image')
+def get_job_image(job_id):
+    """Bytes da imagem do job direto (image/png), sem base64"""
+    job = job_queue.get(job_id)
+    if job is None or not job.image_path:
+        return jsonify({'error': 'Imagem não disponível'}), 404
+    directory, filename = os.path.split(job.image_path)
+    return send_image(directory, filename)
+
+@app.route('/cached/<filename>')
+def serve_cached_image(filename):
+    return send_image(RESULT_CACHE_DIR, filename)
+
+@app.route('/jobs')
+def get_jobs_stats():
+    """Resumo da fila de geração"""
+    return jsonify(job_queue.stats())
+
+@app.route('/cache')
+def get_cache_stats():
+    """Hits/misses dos caches de geração"""
+    stats = {
+        'prompt_embeddings': image_gen.embeddings.stats(),
+        'results': result_cache.stats(),
+        'speech_tts': speech_manager.tts_cache.stats(),
+        'voice_tts': voice_gen.cache.stats()
+    }
+    if chat_gen.response_cache is not None:
+        stats['chat_responses'] = chat_gen.response_cache.stats()
+    return jsonify(stats)
+
+@app.route('/chat/providers')
+def get_chat_providers():
+    """Circuit breakers dos provedores de chat (closed/open/half_open), hedging e contexto"""
+    return jsonify({
+        'providers': chat_gen.health.stats(),
+        'hedging': {
+            'chat': chat_gen.hedge_stats(),
+            'ai': ai_personality.chat_engine.hedge_stats()
+        },
+        'context': chat_gen.context.stats()
+    })
+
+@app.route('/http')
+def get_http_stats():
+    """Pools de conexão HTTP de saída: pedidos e conexões novas vs reusadas por host"""
+    return jsonify(get_client().stats())
+
+@app.route('/memory')
+def get_memory_stats():
+    """Estatísticas do alocador de memória da GPU e dos pipelines residentes"""
+    stats = image_gen.memory.stats()
+    stats['pipelines'] = image_gen.pool.stats()
+    return jsonify(stats)
+
+def _chat_temperature(data):
+    """Temperatura opcional do pedido (0 a 2); sem ela, vale a padrão do chat engine"""
+    try:
+        return max(0.0, min(2.0, float(data['temperature'])))
+    except (KeyError, TypeError, ValueError):
+        return None
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -274,57 +665,128 @@ def chat():
     history = data.get('history', [])
     system_instruction = data.get('system_instruction', None)
     
-    response = chat_gen.chat(message, history, system_instruction)
+    response = chat_gen.chat(message, history, system_instruction, temperature=_chat_temperature(data))
     
     return jsonify({'response': response})
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Versão em streaming do /chat (SSE): eventos `token` e, no fim, `done` com o texto completo"""
+    data = request.json or {}
+    message = data.get('message', '')
+    history = data.get('history', [])
+    system_instruction = data.get('system_instruction', None)
+    temperature = _chat_temperature(data)
+
+    def events():
+        parts = []
+        try:
+            for chunk in chat_gen.chat_stream(message, history, system_instruction, temperature=temperature):
+                parts.append(chunk)
+                yield _sse('token', {'text': chunk})
+        except Exception as e:
+            print(f"Erro no chat (stream): {e}")
+            yield _sse('error', {'error': str(e)})
+            return
+        yield _sse('done', {'response': "".join(parts).strip()})
+
+    return _sse_response(events())
+
 @app.route('/progress')
 def progress():
-    return jsonify({'progress': image_gen.current_progress})
+    """Progresso de um job (?job_id=...). Sem ID, usa o job em execução."""
+    job_id = request.args.get('job_id')
+    job = job_queue.get(job_id) if job_id else job_queue.current()
+    if job is None:
+        if job_id:
+            return jsonify({'error': 'Job não encontrado'}), 404
+        return jsonify({'progress': 0})
+    return jsonify({'job_id': job.id, 'status': job.status, 'progress': job.progress})
 
 # --- NOVA ROTA: Listar Imagens ---
 @app.route('/gallery')
 def get_gallery():
-    if not os.path.exists(IMAGES_DIR):
-        return jsonify([])
-    
-    # Lista arquivos, ordena por data (mais recente primeiro)
-    files = [f for f in os.listdir(IMAGES_DIR) if f.endswith('.png')]
-    files.sort(key=lambda x: os.path.getmtime(os.path.join(IMAGES_DIR, x)), reverse=True)
-    
-    gallery_data = []
-    for filename in files:
-        full_prompt = ""
-        
-        # 1. Tenta ler do arquivo .txt correspondente
-        txt_filename = filename.replace('.png', '.txt')
-        txt_path = os.path.join(IMAGES_DIR, txt_filename)
-        
-        if os.path.exists(txt_path):
-            try:
-                with open(txt_path, 'r', encoding='utf-8') as f:
-                    full_prompt = f.read()
-            except:
-                pass
-        
-        # 2. Se não tiver txt (imagens antigas), tenta pegar do nome do arquivo
-        if not full_prompt:
-            try:
-                parts = filename.split('_', 2)
-                if len(parts) > 2:
-                    full_prompt = parts[2].replace('.png', '').replace('_', ' ')
-                else:
-                    full_prompt = filename
-            except:
-                full_prompt = filename
-            
-        gallery_data.append({
-            'filename': filename,
-            'prompt': full_prompt,
-            'url': f'/images/{filename}'
-        })
-        
-    return jsonify(gallery_data)
+    """
+    Página da galeria por cursor: ?after=<id>&limit=50 (mais recentes primeiro).
+    Responde do catálogo, sem varrer a pasta.
+    """
+    try:
+        after = request.args.get('after', type=int)
+        limit = request.args.get('limit', GALLERY_PAGE_SIZE, type=int)
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    limit = max(1, min(GALLERY_MAX_PAGE_SIZE, limit))
+
+    rows, next_cursor = gallery_catalog.page(after=after, limit=limit)
+    items = [
+        {
+            'id': row['id'],
+            'filename': row['filename'],
+            'prompt': row['prompt'],
+            'created_at': row['created_at'],
+            'url': f"/images/{row['filename']}",
+            'thumb_url': f"/thumbs/256/{row['filename']}"
+        }
+        for row in rows
+    ]
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+@app.route('/thumbs/<int:size>/<filename>')
+def serve_thumbnail(size, filename):
+    """Miniatura WebP (128/256/512), gerada uma vez e servida com ETag + cache longo"""
+    path = thumbnails.ensure(filename, size)
+    if path is None:
+        return jsonify({'error': 'Imagem não encontrada'}), 404
+    directory, thumb_name = os.path.split(path)
+    return send_image(directory, thumb_name)
+
+def _search_url(kind, ref):
+    if kind == 'image':
+        return f"/images/{ref}"
+    if kind == 'speech':
+        return f"/static/ai_speeches/{ref}"
+    return f"/static/audio_generated/{ref}"
+
+@app.route('/search')
+def search():
+    """
+    Busca textual ranqueada: ?q=<texto>&kind=image|speech|audio&limit=20&offset=0.
+    Sem diferenciar acentos e por prefixo ("sao pau" encontra "São Paulo").
+    """
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind') or None
+    if not query:
+        return jsonify({'error': 'Consulta vazia'}), 400
+    if kind is not None and kind not in SEARCH_KINDS:
+        return jsonify({'error': f'kind deve ser um de: {", ".join(SEARCH_KINDS)}'}), 400
+    try:
+        limit = int(request.args.get('limit', SEARCH_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'error': 'Parâmetros inválidos'}), 400
+    limit = max(1, min(SEARCH_MAX_PAGE_SIZE, limit))
+    offset = max(0, offset)
+
+    rows, has_more = search_index.search(query, kind=kind, limit=limit, offset=offset)
+    items = []
+    for row in rows:
+        item = {
+            'kind': row['kind'],
+            'ref': row['ref'],
+            'text': row['text'],
+            'snippet': row['snippet'],
+            'created_at': row['created_at'],
+            'url': _search_url(row['kind'], row['ref'])
+        }
+        if row['kind'] == 'image':
+            item['thumb_url'] = f"/thumbs/256/{row['ref']}"
+        items.append(item)
+
+    return jsonify({
+        'items': items,
+        'offset': offset,
+        'next_offset': offset + len(items) if has_more else None
+    })
 
 @app.route('/audio')
 def audio_page():
@@ -345,6 +807,7 @@ def generate_audio():
     try:
         # Gera o audio
         filename = audio_gen.generate(prompt, AUDIO_DIR)
+        search_index.add('audio', filename, prompt)
         return jsonify({'audio_url': f'/static/audio_generated/{filename}'})
     except Exception as e:
         print(f"Erro ao gerar audio: {e}")
@@ -377,14 +840,36 @@ def speak():
 # --- NOVA ROTA: Servir Imagem Específica ---
 @app.route('/images/<filename>')
 def serve_image(filename):
-    return send_from_directory(IMAGES_DIR, filename)
+    return send_image(IMAGES_DIR, filename)
+
+def send_image(directory, filename):
+    """Serve uma imagem com cache longo: os nomes são únicos e o conteúdo nunca muda"""
+    # A imagem pode ainda estar na fila do writer em segundo plano
+    image_gen.writer.wait_for(os.path.join(directory, filename))
+    response = send_from_directory(directory, filename, max_age=IMAGE_CACHE_SECONDS)
+    response.headers['Cache-Control'] = f'public, max-age={IMAGE_CACHE_SECONDS}, immutable'
+    return response
 
 # ADICIONE ESTA ROTA SE ELA NÃO EXISTIR
 @app.route('/cancel', methods=['POST'])
 def cancel_generation():
     print("--- Rota /cancel chamada! ---") # Debug para ver no terminal
-    image_gen.cancel()
-    return jsonify({'status': 'Cancelamento solicitado'})
+    data = request.get_json(silent=True) or {}
+    job_id = data.get('job_id') or request.args.get('job_id')
+    if not job_id:
+        return jsonify({'error': 'job_id obrigatório'}), 400
+
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify({'status': 'Cancelamento solicitado', 'job_id': job.id, 'job_status': job.status})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_queue.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify({'status': 'Cancelamento solicitado', 'job_id': job.id, 'job_status': job.status})
 
 if __name__ == '__main__':
     # host='0.0.0.0' permite acesso externo
@@ -0,0 +1,169 @@
+"""
+Runtime Assíncrono Compartilhado
+Um único event loop de longa duração num thread próprio, dono de todo o
+trabalho de TTS (edge-tts). As rotas Flask (síncronas) enviam corrotinas
+e esperam o resultado com timeout, sem criar um loop por requisição
+"""
+
+import asyncio
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+DEFAULT_TIMEOUT = float(os.environ.get('TTS_TIMEOUT', 30))
+
+
+class AsyncRuntime:
+    """Event loop rodando para sempre num thread daemon"""
+
+    def __init__(self, name="async-runtime"):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        atexit.register(self.stop)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Agenda a corrotina no loop; devolve um concurrent.futures.Future"""
+        if not self.loop.is_running():
+            coro.close()
+            raise RuntimeError("AsyncRuntime não está rodando")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=DEFAULT_TIMEOUT):
+        """
+        Executa e espera o resultado (para chamadas de threads síncronos).
+        No timeout a corrotina é cancelada e TimeoutError é relançado.
+        """
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("run() chamado de dentro do próprio loop; use await")
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Tempo esgotado após {timeout}s")
+
+    def iterate(self, agen, timeout=DEFAULT_TIMEOUT):
+        """
+        Consome um gerador assíncrono a partir de um thread síncrono (ex: resposta
+        em streaming do Flask). `timeout` vale para cada item. Se o consumidor
+        parar no meio, o gerador é cancelado no loop.
+        """
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in agen:
+                    items.put((item, None))
+                items.put((done, None))
+            except Exception as e:
+                items.put((done, e))
+            finally:
+                await agen.aclose()
+
+        future = self.submit(pump())
+        try:
+            while True:
+                try:
+                    item, error = items.get(timeout=timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"Tempo esgotado após {timeout}s")
+                if error is not None:
+                    raise error
+                if item is done:
+                    return
+                yield item
+        finally:
+            future.cancel()
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+
+class TaskRegistry:
+    """
+    Tarefas em segundo plano consultáveis por id (ex: TTS depois da resposta
+    do chat já ter sido enviada). Guarda os `max_finished` resultados mais recentes.
+    """
+
+    def __init__(self, runtime, max_finished=200, timeout=DEFAULT_TIMEOUT):
+        self.runtime = runtime
+        self.max_finished = max_finished
+        self.timeout = timeout
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, coro, on_result=None):
+        """
+        Agenda a corrotina e devolve o id da tarefa imediatamente.
+        `on_result(valor)` converte o retorno no dicionário exposto em `result`.
+        """
+        task_id = uuid.uuid4().hex
+        with self._lock:
+            self._tasks[task_id] = {
+                'task_id': task_id,
+                'status': 'pending',
+                'created_at': time.time(),
+                'finished_at': None,
+                'result': None,
+                'error': None,
+            }
+            self._prune()
+
+        future = self.runtime.submit(asyncio.wait_for(coro, self.timeout))
+        future.add_done_callback(lambda f: self._finish(task_id, f, on_result))
+        return task_id
+
+    def _finish(self, task_id, future, on_result):
+        try:
+            value = future.result()
+            result = on_result(value) if on_result else value
+            status, error = 'done', None
+        except Exception as e:
+            result, status, error = None, 'error', str(e) or type(e).__name__
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is not None:
+                task.update(status=status, result=result, error=error, finished_at=time.time())
+
+    def _prune(self):
+        """Descarta as tarefas mais antigas já concluídas (chamado com o lock)"""
+        excess = len(self._tasks) - self.max_finished
+        if excess <= 0:
+            return
+        for task_id in [tid for tid, t in self._tasks.items() if t['status'] != 'pending'][:excess]:
+            del self._tasks[task_id]
+
+    def get(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            return dict(task) if task else None
+
+
+_runtime = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime():
+    """Runtime do processo (criado no primeiro uso)"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = AsyncRuntime(name="tts-event-loop")
+        return _runtime
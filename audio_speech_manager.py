@@ -7,27 +7,51 @@ import os
 import asyncio
 import edge_tts
 import re
+import shutil
+import uuid
 from datetime import datetime
-import json
 from pathlib import Path
 
+from speech_metadata import SpeechMetadataStore
+from tts_cache import TTSCache, prune_files
+
+SPEECH_RATE = "-10%"
+SPEECH_PITCH = "+0Hz"
+
 class AudioSpeechManager:
     """
     Gerencia a geração de fala (TTS) das respostas da IA
     e o armazenamento dos áudios gerados
     """
     
-    def __init__(self, audio_dir='templates/static/audio_generated', speech_dir='templates/static/ai_speeches'):
+    def __init__(self, audio_dir='templates/static/audio_generated', speech_dir='templates/static/ai_speeches',
+                 search_index=None):
         self.audio_dir = audio_dir
         self.speech_dir = speech_dir
-        self.metadata_file = os.path.join(self.speech_dir, 'speeches_metadata.json')
+        self.search_index = search_index  # SearchIndex opcional (busca FTS)
+        self.max_parallel_segments = int(os.environ.get('TTS_MAX_PARALLEL', 3))
+        self.metadata_file = os.path.join(self.speech_dir, 'speeches_metadata.jsonl')
+        self.legacy_metadata_file = os.path.join(self.speech_dir, 'speeches_metadata.json')
         
         # Criar diretórios se não existirem
         os.makedirs(self.audio_dir, exist_ok=True)
         os.makedirs(self.speech_dir, exist_ok=True)
         
-        # Carregar metadados existentes
-        self.metadata = self._load_metadata()
+        # Metadados em log só de acréscimo (migra o .json antigo na primeira vez)
+        self.metadata = SpeechMetadataStore(self.metadata_file, legacy_path=self.legacy_metadata_file)
+        
+        # Cache de síntese (texto, voz, rate, pitch) -> MP3; também serve os trechos do streaming
+        self.tts_cache = TTSCache(os.path.join(self.speech_dir, 'cache'))
+        # Trechos já entregues por URL ficam fora do cache (a evicção LRU não os quebra)
+        # (hard links seguram o MP3 mesmo depois da evicção: limpos por idade e tamanho)
+        self.segments_dir = os.path.join(self.speech_dir, 'segments')
+        self.segment_max_age = int(os.environ.get('TTS_SEGMENT_MAX_AGE', 3600))
+        self.segments_max_bytes = int(os.environ.get('TTS_SEGMENTS_MB', 64)) * 1024 * 1024
+        os.makedirs(self.segments_dir, exist_ok=True)
+        # Fala já na galeria para cada chave do cache (evita arquivos duplicados)
+        self._speeches_by_key = {
+            meta['tts_key']: filename for filename, meta in self.metadata.items() if meta.get('tts_key')
+        }
         
         # Vozes disponíveis em português (edge-tts)
         self.voices = {
@@ -38,21 +62,6 @@ class AudioSpeechManager:
         
         self.voice = self.voices['karen_pt']
     
-    def _load_metadata(self):
-        """Carrega metadados de áudios já salvos"""
-        if os.path.exists(self.metadata_file):
-            try:
-                with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except:
-                return {}
-        return {}
-    
-    def _save_metadata(self):
-        """Salva metadados dos áudios"""
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
-    
     def _clean_text_for_speech(self, text):
         """
         Remove caracteres especiais e emojis para leitura natural
@@ -76,6 +85,73 @@ class AudioSpeechManager:
         
         return text
     
+    def _speech_filename(self, clean_text):
+        """Nome do arquivo: timestamp + primeiros caracteres do texto"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        safe_text = "".join(c if c.isalnum() or c in ' -_' else '' 
+                           for c in clean_text[:30]).strip()
+        safe_text = safe_text.replace(' ', '_')
+        
+        return f"ai_speech_{timestamp}_{safe_text}.mp3"
+    
+    def _record_speech(self, filename, filepath, text, speaker, clean_text, tts_key=None):
+        """Salva metadados (com texto original) e indexa a fala para busca"""
+        self.metadata.put(filename, {
+            'text': text,
+            'voice': speaker,
+            'date': datetime.now().isoformat(),
+            'duration': self._estimate_duration(clean_text),
+            'file_path': filepath,
+            'tts_key': tts_key
+        })
+        if tts_key:
+            self._speeches_by_key[tts_key] = filename
+        if self.search_index is not None:
+            self.search_index.add('speech', filename, text)
+    
+    def _tts_key(self, clean_text, voice):
+        return self.tts_cache.key_for(clean_text, voice, SPEECH_RATE, SPEECH_PITCH)
+    
+    async def _synthesize_cached(self, key, clean_text, voice):
+        """(caminho do MP3 no cache, veio_do_cache), sintetizando só se ainda não existir"""
+        async def synthesize(path):
+            communicate = edge_tts.Communicate(text=clean_text, voice=voice, rate=SPEECH_RATE, pitch=SPEECH_PITCH)
+            await communicate.save(path)
+        
+        return await self.tts_cache.get_or_create(key, synthesize)
+    
+    def _existing_speech(self, key):
+        """Fala da galeria com o mesmo áudio, se ainda existir"""
+        filename = self._speeches_by_key.get(key)
+        if filename and filename in self.metadata and os.path.exists(os.path.join(self.speech_dir, filename)):
+            return filename
+        return None
+    
+    def _publish(self, source, filepath):
+        """Coloca o áudio do cache na galeria (hard link quando possível)"""
+        try:
+            os.link(source, filepath)
+        except OSError:
+            shutil.copyfile(source, filepath)
+    
+    def _publish_segment(self, source):
+        """Trecho do streaming em segments/ (hard link do cache, mesmo nome); devolve o caminho"""
+        target = os.path.join(self.segments_dir, os.path.basename(source))
+        if os.path.exists(target):
+            os.utime(target)  # em uso de novo: a limpeza conta a idade a partir daqui
+        else:
+            tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+            self._publish(source, tmp_path)
+            os.replace(tmp_path, target)
+        return target
+    
+    def _cleanup_segments(self):
+        """Remove trechos de streams antigos (o cliente já os tocou)"""
+        removed = prune_files(self.segments_dir, max_age=self.segment_max_age, max_bytes=self.segments_max_bytes)
+        if removed:
+            print(f"Trechos de fala removidos: {removed}")
+    
     async def text_to_speech(self, text, speaker='karen_pt'):
         """
         Converte texto em fala usando edge-tts
@@ -91,33 +167,28 @@ class AudioSpeechManager:
             # Limpar texto para leitura natural
             clean_text = self._clean_text_for_speech(text)
             
-            # Sanitizar nome do arquivo
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # Selecionar voz
+            voice = self.voices.get(speaker, self.voices['default'])
             
-            # Usar primeiros caracteres do texto como nome
-            safe_text = "".join(c if c.isalnum() or c in ' -_' else '' 
-                               for c in clean_text[:30]).strip()
-            safe_text = safe_text.replace(' ', '_')
+            # Mesma fala já salva: devolve o arquivo existente
+            key = self._tts_key(clean_text, voice)
+            existing = self._existing_speech(key)
+            if existing:
+                return os.path.join(self.speech_dir, existing), existing
             
-            filename = f"ai_speech_{timestamp}_{safe_text}.mp3"
-            filepath = os.path.join(self.speech_dir, filename)
+            # Gerar fala (usando texto limpo) ou reaproveitar do cache
+            cached_path, _ = await self._synthesize_cached(key, clean_text, voice)
             
-            # Selecionar voz
-            voice = self.voices.get(speaker, self.voices['default'])
+            # Outra requisição igual pode ter salvo a fala enquanto esperávamos
+            existing = self._existing_speech(key)
+            if existing:
+                return os.path.join(self.speech_dir, existing), existing
             
-            # Criar cliente e gerar fala (usando texto limpo)
-            communicate = edge_tts.Communicate(text=clean_text, voice=voice, rate="-10%")
-            await communicate.save(filepath)
+            filename = self._speech_filename(clean_text)
+            filepath = os.path.join(self.speech_dir, filename)
+            self._publish(cached_path, filepath)
             
-            # Salvar metadados (com texto original)
-            self.metadata[filename] = {
-                'text': text,
-                'voice': speaker,
-                'date': datetime.now().isoformat(),
-                'duration': self._estimate_duration(clean_text),
-                'file_path': filepath
-            }
-            self._save_metadata()
+            self._record_speech(filename, filepath, text, speaker, clean_text, tts_key=key)
             
             return filepath, filename
             
@@ -125,6 +196,112 @@ class AudioSpeechManager:
             print(f"Erro ao gerar fala: {e}")
             return None, None
     
+    async def prewarm(self, texts, speaker='karen_pt', max_parallel=None):
+        """
+        Sintetiza falas fixas (ociosas, fallback) no cache, sem criar itens na galeria.
+        Devolve quantas foram sintetizadas de fato (as demais já estavam no cache).
+        """
+        voice = self.voices.get(speaker, self.voices['default'])
+        semaphore = asyncio.Semaphore(max_parallel or self.max_parallel_segments)
+        created = 0
+        
+        async def warm(text):
+            nonlocal created
+            clean_text = self._clean_text_for_speech(text)
+            key = self._tts_key(clean_text, voice)
+            if os.path.exists(self.tts_cache.path_for(key)):
+                return
+            async with semaphore:
+                _, cached = await self._synthesize_cached(key, clean_text, voice)
+            if not cached:
+                created += 1
+        
+        texts = list(dict.fromkeys(texts))
+        results = await asyncio.gather(*(warm(text) for text in texts), return_exceptions=True)
+        failed = sum(1 for r in results if isinstance(r, Exception))
+        print(f"Cache de TTS pré-aquecido: {created} novas falas, {failed} falhas")
+        return created
+    
+    def _split_sentences(self, clean_text, min_chars=20):
+        """
+        Divide o texto em frases para o TTS em streaming.
+        Frases muito curtas são juntadas à seguinte (menos requisições ao edge-tts).
+        """
+        parts = [p.strip() for p in re.split(r'(?<=[\.\!\?])\s+', clean_text) if p.strip()]
+        sentences = []
+        buffer = ''
+        for part in parts:
+            buffer = f"{buffer} {part}".strip()
+            if len(buffer) >= min_chars:
+                sentences.append(buffer)
+                buffer = ''
+        if buffer:
+            if sentences:
+                sentences[-1] = f"{sentences[-1]} {buffer}"
+            else:
+                sentences.append(buffer)
+        return sentences
+    
+    async def stream_speech(self, text, speaker='karen_pt', max_parallel=None):
+        """
+        TTS em streaming: sintetiza as frases em paralelo (limitado por semáforo)
+        e entrega os trechos em ordem assim que cada um fica pronto.
+        
+        Gera dicionários {'type': 'segment', 'index', 'total', 'text', 'url'} e, no fim,
+        {'type': 'done', 'filename', 'audio_url'} com o MP3 completo salvo para a galeria.
+        """
+        clean_text = self._clean_text_for_speech(text)
+        sentences = self._split_sentences(clean_text)
+        if not sentences:
+            return
+        
+        await asyncio.to_thread(self._cleanup_segments)
+        
+        voice = self.voices.get(speaker, self.voices['default'])
+        semaphore = asyncio.Semaphore(max_parallel or self.max_parallel_segments)
+        
+        async def synthesize(sentence):
+            async with semaphore:
+                path, _ = await self._synthesize_cached(self._tts_key(sentence, voice), sentence, voice)
+                return self._publish_segment(path)
+        
+        tasks = [asyncio.ensure_future(synthesize(sentence)) for sentence in sentences]
+        paths = []
+        try:
+            for index, task in enumerate(tasks):
+                path = await task
+                paths.append(path)
+                yield {
+                    'type': 'segment',
+                    'index': index,
+                    'total': len(sentences),
+                    'text': sentences[index],
+                    'url': f'/static/ai_speeches/segments/{os.path.basename(path)}'
+                }
+        finally:
+            # Cliente desconectou ou um trecho falhou: não sintetizar o resto
+            for task in tasks:
+                task.cancel()
+        
+        key = self._tts_key(clean_text, voice)
+        filename = self._existing_speech(key)
+        if filename is None:
+            # MP3 aceita concatenação direta dos quadros
+            filename = self._speech_filename(clean_text)
+            filepath = os.path.join(self.speech_dir, filename)
+            await asyncio.to_thread(self._concat_segments, paths, filepath)
+            self._record_speech(filename, filepath, text, speaker, clean_text, tts_key=key)
+        
+        yield {'type': 'done', 'filename': filename, 'audio_url': f'/static/ai_speeches/{filename}'}
+    
+    def _concat_segments(self, paths, filepath):
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            for path in paths:
+                with open(path, 'rb') as segment:
+                    out.write(segment.read())
+        os.replace(tmp_path, filepath)
+    
     def _estimate_duration(self, text):
         """Estima duração da fala baseada no texto"""
         # Aproximação: ~150 palavras por minuto em português
@@ -156,9 +333,12 @@ class AudioSpeechManager:
         if os.path.exists(filepath):
             try:
                 os.remove(filepath)
-                if filename in self.metadata:
-                    del self.metadata[filename]
-                    self._save_metadata()
+                meta = self.metadata.get(filename) or {}
+                self.metadata.delete(filename)
+                if self._speeches_by_key.get(meta.get('tts_key')) == filename:
+                    del self._speeches_by_key[meta['tts_key']]
+                if self.search_index is not None:
+                    self.search_index.remove('speech', filename)
                 return True
             except:
                 return False
@@ -166,22 +346,46 @@ class AudioSpeechManager:
     
     def get_speech_text(self, filename):
         """Retorna o texto de uma fala específica"""
-        if filename in self.metadata:
-            return self.metadata[filename]['text']
+        metadata = self.metadata.get(filename)
+        if metadata is not None:
+            return metadata['text']
         return None
     
-    def search_speeches(self, query):
-        """Busca falas por texto"""
+    def index_documents(self):
+        """(filename, texto, timestamp) de cada fala, para sincronizar o índice de busca"""
+        docs = []
+        for filename, metadata in self.metadata.items():
+            try:
+                created_at = datetime.fromisoformat(metadata['date']).timestamp()
+            except (KeyError, ValueError):
+                created_at = 0.0
+            docs.append((filename, metadata.get('text', ''), created_at))
+        return docs
+    
+    def _speech_result(self, filename, metadata):
+        return {
+            'filename': filename,
+            'title': metadata['text'][:60] + '...' if len(metadata['text']) > 60 else metadata['text'],
+            'date': metadata['date'],
+            'url': f'/static/ai_speeches/{filename}'
+        }
+    
+    def search_speeches(self, query, limit=50, offset=0):
+        """Busca falas por texto (ranqueada pelo índice FTS quando disponível)"""
+        if self.search_index is not None:
+            rows, _ = self.search_index.search(query, kind='speech', limit=limit, offset=offset)
+            results = []
+            for row in rows:
+                metadata = self.metadata.get(row['ref'])
+                if metadata is not None:
+                    results.append(self._speech_result(row['ref'], metadata))
+            return results
+        
         results = []
         query_lower = query.lower()
         
         for filename, metadata in self.metadata.items():
             if query_lower in metadata['text'].lower():
-                results.append({
-                    'filename': filename,
-                    'title': metadata['text'][:60] + '...' if len(metadata['text']) > 60 else metadata['text'],
-                    'date': metadata['date'],
-                    'url': f'/static/ai_speeches/{filename}'
-                })
-        
-        return results
+                results.append(self._speech_result(filename, metadata))
+        
+        return results[offset:offset + limit]
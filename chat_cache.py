@@ -0,0 +1,183 @@
+"""
+Cache de Respostas do Chat
+Reaproveita respostas para mensagens curtas e repetidas ("oi", "obrigado")
+quando a temperatura não é alta. Chave normalizada de (instrução de sistema,
+histórico recente, mensagem, provedor, modelo, faixa de temperatura), com
+TTL + LRU e busca opcional por similaridade de embeddings
+"""
+
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """Minúsculas, sem acentos, espaços colapsados e sem pontuação nas pontas"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.strip(' .,!?;:…')
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ChatResponseCache:
+    """
+    LRU com expiração. `embed_fn(texto) -> lista de floats` (opcional) permite
+    reaproveitar respostas de mensagens quase iguais no mesmo contexto.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, max_temperature=None, history_turns=2,
+                 embed_fn=None, similarity=0.95):
+        if max_entries is None:
+            max_entries = int(os.environ.get('CHAT_CACHE_SIZE', 512))
+        if ttl is None:
+            ttl = float(os.environ.get('CHAT_CACHE_TTL', 600))
+        if max_temperature is None:
+            # Cobre a temperatura padrão das rotas (0.8 no /chat, 0.85 na IA): quem liga o
+            # cache aceita repetir respostas; pedidos mais criativos que isso passam direto
+            max_temperature = float(os.environ.get('CHAT_CACHE_MAX_TEMPERATURE', 1.0))
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.history_turns = history_turns
+        self.embed_fn = embed_fn
+        self.similarity = similarity
+
+        self._entries = OrderedDict()  # chave -> (expira_em, resposta, embedding)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+
+    def cacheable(self, temperature):
+        return temperature is not None and temperature <= self.max_temperature
+
+    def context_key(self, system_instruction, history, provider, model, temperature):
+        """Tudo menos a mensagem: respostas só são reaproveitadas no mesmo contexto"""
+        recent = history[-self.history_turns * 2:] if history and self.history_turns else []
+        turns = tuple(
+            (item.get('role'), normalize_text(item.get('content', '')))
+            for item in recent if isinstance(item, dict)
+        )
+        bucket = round(temperature * 4) / 4  # faixas de 0.25
+        return (normalize_text(system_instruction), turns, provider, model or '', bucket)
+
+    def get(self, message, **context):
+        """Resposta em cache ou None (conta como skip se a temperatura for alta)"""
+        if not self.cacheable(context.get('temperature')):
+            with self._lock:
+                self.skipped += 1
+            return None
+
+        context_key = self.context_key(**context)
+        normalized = normalize_text(message)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get((context_key, normalized))
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end((context_key, normalized))
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[(context_key, normalized)]
+
+        if self.embed_fn is not None and normalized:
+            response = self._similar(context_key, normalized, now)
+            if response is not None:
+                return response
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _similar(self, context_key, normalized, now):
+        """Entrada do mesmo contexto com embedding próximo o bastante"""
+        try:
+            query = self.embed_fn(normalized)
+        except Exception as e:
+            print(f"Erro no embedding do cache de chat: {e}")
+            return None
+
+        with self._lock:
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if key[0] == context_key and entry[2] is not None and entry[0] > now
+            ]
+
+        best_key, best_response, best_score = None, None, self.similarity
+        for key, (_, response, embedding) in candidates:
+            score = _cosine(query, embedding)
+            if score >= best_score:
+                best_key, best_response, best_score = key, response, score
+
+        if best_key is None:
+            return None
+        with self._lock:
+            if best_key in self._entries:
+                self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+        return best_response
+
+    def put(self, message, response, **context):
+        if not response or not self.cacheable(context.get('temperature')):
+            return
+        context_key = self.context_key(**context)
+        normalized = normalize_text(message)
+
+        embedding = None
+        if self.embed_fn is not None and normalized:
+            try:
+                embedding = self.embed_fn(normalized)
+            except Exception as e:
+                print(f"Erro no embedding do cache de chat: {e}")
+
+        with self._lock:
+            self._entries[(context_key, normalized)] = (time.time() + self.ttl, response, embedding)
+            self._entries.move_to_end((context_key, normalized))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "max_temperature": self.max_temperature,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.semantic_hits) / total, 3) if total else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_chat_cache():
+    """Cache compartilhado pelos ChatEngines do processo (criado no primeiro uso)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ChatResponseCache()
+        return _cache
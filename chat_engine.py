@@ -1,20 +1,67 @@
+import json
 import os
 import requests
 import urllib.parse
 import time
 import random
 import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from http_client import get_client
+from circuit_breaker import get_provider_health
+from chat_cache import get_chat_cache
+from context_builder import get_context_builder
+
+
+class ProviderUnavailable(Exception):
+    """Provedor fora do ar (timeout, conexão recusada, 5xx): conta como falha no circuit breaker"""
+
 
 class ChatEngine:
-    def __init__(self):
+    def __init__(self, http=None, response_cache=None):
+        # Sessão com keep-alive compartilhada (evita handshake TCP+TLS a cada turno)
+        self.http = http or get_client()
+        # Cache de respostas (opcional): passe um ChatResponseCache ou use CHAT_RESPONSE_CACHE=1
+        if response_cache is None and os.environ.get('CHAT_RESPONSE_CACHE', '0') == '1':
+            response_cache = get_chat_cache()
+        self.response_cache = response_cache
+        # Histórico enviado aos provedores limitado por tokens (CHAT_CONTEXT_TOKENS)
+        self.context = get_context_builder()
         self.base_url = "https://text.pollinations.ai/"
-        self.retry_count = 1
         self.timeout = 60
-        self.retry_backoff = [1.5, 3]
-        self.global_timeout = 60
+        # Orçamento total por chamada: depois disso vale o fallback local
+        self.global_timeout = float(os.environ.get('CHAT_LATENCY_BUDGET', 30))
+
+        # Hedging: sem resposta dentro do p95 recente, dispara a próxima tentativa em paralelo
+        self.hedge_default = float(os.environ.get('CHAT_HEDGE_SECONDS', 8))
+        self.hedge_min = 1.0
+        self.hedge_percentile = 0.95
+        self._latencies = deque(maxlen=100)
+        self._hedge_lock = threading.Lock()
+        self._hedge_stats = {"calls": 0, "hedges": 0, "hedges_skipped": 0, "budget_exhausted": 0, "wins": {}}
+        # Tentativas em andamento (inclusive perdedoras ainda abortando): com o pool cheio não há hedge
+        self._max_workers = int(os.environ.get('CHAT_HEDGE_WORKERS', 8))
+        self._active_attempts = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_workers,
+            thread_name_prefix="chat-hedge"
+        )
         self.ollama_url = os.environ.get('OLLAMA_URL', 'http://localhost:11434')
         self.default_temperature = 0.8
 
+        # Circuit breakers compartilhados: provedor fora do ar é pulado na hora
+        self.health = get_provider_health()
+        # Chamada lenta fica abaixo do teto de cada provedor (senão a regra nunca dispara):
+        # Ollama acima do hedge já faz pagar o atraso; Pollinations acima de metade do orçamento
+        open_seconds = float(os.environ.get('CHAT_BREAKER_OPEN_SECONDS', 30))
+        self.ollama_timeout = 15
+        self.health.register('ollama', probe=self._probe_ollama, open_seconds=open_seconds,
+                             slow_call_seconds=min(self.hedge_default, 0.8 * self.ollama_timeout))
+        self.health.register('pollinations', probe=self._probe_pollinations, open_seconds=open_seconds,
+                             slow_call_seconds=0.5 * self.global_timeout)
+
         # Frases divertidas para fallback caso a API não responda
         self.fallback_templates = [
             "Estou recalibrando meus circuitos criativos. Enquanto isso, me conta mais sobre {topic}?",
@@ -32,86 +79,396 @@ class ChatEngine:
         provider_key = (provider or 'pollinations').lower()
         temp_value = temperature if temperature is not None else self.default_temperature
 
-        if provider_key == 'ollama':
-            result = self._ollama_chat(message, history, system_instruction, model, temp_value)
-            if result:
-                return result
-            print("Ollama não retornou resultado. Recuando para Pollinations.")
-
-        return self._chat_pollinations(message, history, system_instruction)
+        cache_context = self._cache_context(history, system_instruction, provider_key, model, temp_value)
+        if cache_context is not None:
+            cached = self.response_cache.get(message, **cache_context)
+            if cached:
+                return cached
+
+        attempts = self._attempts(provider_key, message, history, system_instruction, model, temp_value)
+        result = self._race(attempts)
+        if result:
+            if cache_context is not None:
+                self.response_cache.put(message, result, **cache_context)
+            return result
+
+        print("Nenhum provedor respondeu dentro do orçamento. Usando fallback local.")
+        return self._generate_fallback(message)
+
+    def _cache_context(self, history, system_instruction, provider_key, model, temperature):
+        """Contexto da chave do cache de respostas (None com o cache desligado)"""
+        if self.response_cache is None:
+            return None
+        return {
+            "system_instruction": system_instruction,
+            "history": history,
+            "provider": provider_key,
+            "model": model,
+            "temperature": temperature,
+        }
 
-    def _chat_pollinations(self, message, history, system_instruction):
+    def _attempts(self, provider_key, message, history, system_instruction, model, temperature):
         """
-        Fluxo padrão usando Pollinations.
+        Tentativas em ordem de preferência: (nome, provedor, função(timeout, cancel) -> texto ou None).
+        Ollama (quando escolhido) vem primeiro; depois POST, GET e um segundo POST no Pollinations.
+        `cancel` (threading.Event) é ligado quando a corrida termina: a tentativa para de ler e solta o thread.
         """
+        attempts = []
+        if provider_key == 'ollama':
+            attempts.append(('ollama', 'ollama', lambda timeout, cancel: self._ollama_chat(
+                message, history, system_instruction, model, temperature, timeout=timeout, cancel=cancel)))
+
+        prompt = self._build_prompt(message, history, system_instruction)
+        attempts.append(('pollinations_post', 'pollinations',
+                         lambda timeout, cancel: self._pollinations_post(prompt, 0, timeout=timeout, cancel=cancel)))
+        attempts.append(('pollinations_get', 'pollinations',
+                         lambda timeout, cancel: self._pollinations_get(
+                             message, system_instruction, timeout=timeout, cancel=cancel)))
+        attempts.append(('pollinations_post_retry', 'pollinations',
+                         lambda timeout, cancel: self._pollinations_post(prompt, 1, timeout=timeout, cancel=cancel)))
+        return attempts
+
+    def hedge_delay(self):
+        """p95 das latências recentes (com poucas amostras, o valor configurado)"""
+        with self._hedge_lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 10:
+            return self.hedge_default
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+        return max(self.hedge_min, samples[index])
+
+    def _race(self, attempts, budget=None, skip_record=()):
+        """
+        Executa as tentativas com hedging dentro do orçamento: começa pela primeira e
+        dispara a próxima quando a atual passa do p95 ou falha. A primeira resposta
+        válida vence; as perdedoras recebem o sinal de cancelamento e param de ler a resposta.
+        Com o pool saturado não há hedge: a chamada espera a tentativa que já está rodando.
+        """
+        budget = self.global_timeout if budget is None else budget
+        deadline = time.time() + budget
+        hedge_delay = self.hedge_delay()
+        queue = list(attempts)
+        running = {}
+        cancel = threading.Event()
+        # Um veredito por provedor ao fim da chamada (não um por tentativa)
+        by_provider = {}
+        winner = None
+        exhausted = False
+
+        with self._hedge_lock:
+            self._hedge_stats["calls"] += 1
+
+        def launch():
+            """Dispara a próxima tentativa cujo circuito permite; False se não sobrou nenhuma"""
+            if running:
+                with self._hedge_lock:
+                    saturated = self._active_attempts >= self._max_workers
+                    if saturated:
+                        self._hedge_stats["hedges_skipped"] += 1
+                if saturated:
+                    print("Pool de tentativas cheio: sem hedge desta vez")
+                    return False
+
+            while queue:
+                name, provider, fn = queue.pop(0)
+                breaker = self.health.breaker(provider)
+                if breaker is None or breaker.allow():
+                    break
+                print(f"Circuito de '{provider}' aberto: pulando '{name}'")
+            else:
+                return False
+
+            started = time.time()
+            remaining = max(0.5, deadline - started)
+            with self._hedge_lock:
+                self._active_attempts += 1
+            future = self._executor.submit(fn, remaining, cancel)
+            future.add_done_callback(self._attempt_finished)
+            running[future] = (name, provider, started)
+            by_provider.setdefault(provider, []).append((future, started))
+            if len(running) > 1:
+                with self._hedge_lock:
+                    self._hedge_stats["hedges"] += 1
+                print(f"Hedge: disparando '{name}' em paralelo")
+            return True
+
+        launch()
         try:
-            prompt = self._build_prompt(message, history, system_instruction)
-            print(f"Chat Request: {prompt[:80]}...")
+            while running:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    exhausted = True
+                    with self._hedge_lock:
+                        self._hedge_stats["budget_exhausted"] += 1
+                    print(f"Orçamento de {budget}s esgotado")
+                    return None
+
+                timeout = min(remaining, hedge_delay) if queue else remaining
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    name, provider, started = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Tentativa '{name}' falhou: {e}")
+                        result = None
+                    if result:
+                        winner = (provider, time.time() - started)
+                        with self._hedge_lock:
+                            self._latencies.append(time.time() - started)
+                            wins = self._hedge_stats["wins"]
+                            wins[name] = wins.get(name, 0) + 1
+                        return result
+
+                # Passou do p95 sem resposta ou a tentativa falhou: próxima em paralelo
+                if queue and (not done or not running):
+                    launch()
+            return None
+        finally:
+            cancel.set()
+            for future in running:
+                future.cancel()
+            self._record_call(by_provider, winner, exhausted, budget, skip=skip_record)
+
+    def _attempt_finished(self, future):
+        with self._hedge_lock:
+            self._active_attempts -= 1
+
+    def _record_call(self, by_provider, winner, exhausted, budget, skip=()):
+        """
+        Registra no breaker um resultado por provedor da chamada: sucesso se alguma
+        tentativa venceu; falha se alguma achou o provedor fora do ar (ou o orçamento
+        acabou sem nenhuma terminar). Tentativas que ainda rodam (ex: Ollama travado
+        que perdeu para o hedge) dão o veredito quando terminarem; senão (429,
+        resposta vazia, cancelada) nada conta.
+        """
+        for provider, attempts in by_provider.items():
+            breaker = self.health.breaker(provider)
+            if breaker is None or provider in skip:
+                continue
+            if winner is not None and winner[0] == provider:
+                breaker.record_success(winner[1])
+                continue
+            finished = [f for f, _ in attempts if f.done() and not f.cancelled()]
+            down = any(isinstance(f.exception(), ProviderUnavailable) for f in finished)
+            pending = [(f, started) for f, started in attempts if not f.done()]
+            if down or (exhausted and not finished):
+                breaker.record_failure(budget if exhausted else None)
+            elif pending:
+                self._record_late(breaker, pending)
+            else:
+                breaker.release()
 
-            start_time = time.time()
-            for attempt in range(self.retry_count + 1):
-                if time.time() - start_time > self.global_timeout:
-                    print("Tempo limite global atingido, interrompendo tentativas externas")
-                    break
+    def _record_late(self, breaker, attempts):
+        """
+        Veredito das tentativas que a corrida deixou rodando, quando a última terminar:
+        fora do ar conta como falha; resposta (ou abandono) depois do limite, como chamada lenta.
+        """
+        started = min(started for _, started in attempts)
+        remaining = [len(attempts)]
+        lock = threading.Lock()
+
+        def finished(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            latency = time.time() - started
+            futures = [f for f, _ in attempts if not f.cancelled()]
+            if any(isinstance(f.exception(), ProviderUnavailable) for f in futures):
+                breaker.record_failure(latency)
+            elif breaker.slow_call_seconds and latency > breaker.slow_call_seconds:
+                breaker.record_success(latency)
+            else:
+                breaker.release()
 
-                result = self._pollinations_post(prompt, attempt)
-                if result:
-                    return result
+        for future, _ in attempts:
+            future.add_done_callback(finished)
 
-                if attempt < self.retry_count:
-                    wait_time = self.retry_backoff[min(attempt, len(self.retry_backoff) - 1)]
-                    print(f"Nova tentativa em {wait_time}s...")
-                    time.sleep(wait_time)
+    def _probe_ollama(self):
+        response = self.http.get(f"{self.ollama_url}/api/tags", timeout=3)
+        return response.status_code == 200
 
-            if time.time() - start_time <= self.global_timeout:
-                result = self._pollinations_get(message, system_instruction)
-                if result:
-                    return result
+    def _probe_pollinations(self):
+        response = self.http.get(f"{self.base_url}models", timeout=5)
+        return response.status_code < 500
 
-            print("Todas as tentativas externas falharam. Usando fallback local.")
-            return self._generate_fallback(message)
+    def hedge_stats(self):
+        with self._hedge_lock:
+            stats = dict(self._hedge_stats, wins=dict(self._hedge_stats["wins"]))
+            stats["active_attempts"] = self._active_attempts
+        stats["max_workers"] = self._max_workers
+        stats["hedge_delay"] = round(self.hedge_delay(), 3)
+        stats["latency_budget"] = self.global_timeout
+        return stats
 
-        except Exception as e:
-            print(f"Erro no Chat Engine: {e}")
-            return self._generate_fallback(message)
+    def chat_stream(self, message, history=None, system_instruction=None, provider=None, model=None, temperature=None):
+        """
+        Versão em streaming de chat(): gera os pedaços do texto conforme chegam.
+        Provedor que falha antes do primeiro pedaço recua para o próximo; sem
+        streaming disponível, a resposta completa (ou o fallback local) sai de uma vez.
+        """
+        provider_key = (provider or 'pollinations').lower()
+        temp_value = temperature if temperature is not None else self.default_temperature
+
+        cache_context = self._cache_context(history, system_instruction, provider_key, model, temp_value)
+        if cache_context is not None:
+            cached = self.response_cache.get(message, **cache_context)
+            if cached:
+                yield cached
+                return
+
+        if cache_context is None:
+            yield from self._stream_providers(provider_key, message, history, system_instruction, model, temp_value)
+            return
+
+        # Repassa os trechos e guarda a resposta completa (só se veio de um provedor)
+        stream = self._stream_providers(provider_key, message, history, system_instruction, model, temp_value)
+        parts = []
+        try:
+            while True:
+                try:
+                    chunk = next(stream)
+                except StopIteration as done:
+                    from_provider = done.value
+                    break
+                parts.append(chunk)
+                yield chunk
+        finally:
+            stream.close()
 
-    def _ollama_chat(self, message, history, system_instruction, model, temperature):
+        response = "".join(parts).strip()
+        if from_provider and response:
+            self.response_cache.put(message, response, **cache_context)
+
+    def _stream_providers(self, provider_key, message, history, system_instruction, model, temp_value):
+        """
+        Trechos do primeiro provedor que responder; devolve False se caiu no fallback local.
+        Streams e corrida sem streaming dividem o mesmo orçamento (CHAT_LATENCY_BUDGET).
+        """
+        deadline = time.time() + self.global_timeout
+        recorded = set()
+        if provider_key == 'ollama':
+            stream = self._ollama_stream(message, history, system_instruction, model, temp_value, deadline=deadline)
+            if (yield from self._guarded_stream('ollama', stream, recorded)):
+                return True
+            print("Ollama não transmitiu resposta. Recuando para Pollinations.")
+
+        prompt = self._build_prompt(message, history, system_instruction)
+        if time.time() < deadline:
+            stream = self._pollinations_stream(prompt, deadline=deadline)
+            if (yield from self._guarded_stream('pollinations', stream, recorded)):
+                return True
+
+        remaining = deadline - time.time()
+        if remaining > 0:
+            print("Streaming indisponível. Usando fluxo sem streaming.")
+            attempts = self._attempts('pollinations', message, history, system_instruction, model, temp_value)
+            # Provedor que já falhou no streaming não conta de novo nesta chamada
+            result = self._race(attempts, budget=remaining, skip_record=recorded)
+            if result:
+                yield result
+                return True
+        else:
+            print(f"Orçamento de {self.global_timeout}s esgotado no streaming")
+        yield self._generate_fallback(message)
+        return False
+
+    @staticmethod
+    def _stream_timeout(cap, deadline):
+        """Timeout de leitura do stream: o teto do provedor, sem passar do prazo da chamada"""
+        if deadline is None:
+            return cap
+        return max(0.5, min(cap, deadline - time.time()))
+
+    def _guarded_stream(self, provider, stream, recorded=None):
+        """
+        Repassa o stream se o circuito do provedor permitir e registra o resultado
+        (latência até o primeiro pedaço). Devolve True se algum texto foi gerado.
+        """
+        breaker = self.health.breaker(provider)
+        if breaker is not None and not breaker.allow():
+            print(f"Circuito de '{provider}' aberto: pulando streaming")
+            stream.close()
+            return False
+
+        started = time.time()
+        first_chunk_at = None
+        down = False
+        try:
+            for chunk in stream:
+                if first_chunk_at is None:
+                    first_chunk_at = time.time()
+                    if breaker is not None:
+                        breaker.record_success(first_chunk_at - started)
+                yield chunk
+        except ProviderUnavailable:
+            down = True
+
+        if first_chunk_at is None and breaker is not None:
+            # Só fora do ar conta como falha; 429 ou corpo vazio não dizem nada do provedor
+            if down:
+                breaker.record_failure(time.time() - started)
+                if recorded is not None:
+                    recorded.add(provider)
+            else:
+                breaker.release()
+        return first_chunk_at is not None
+
+    def _ollama_payload(self, message, history, system_instruction, model, temperature, stream):
         model_name = (model or 'llama3.1:latest').strip()
         if not model_name:
             model_name = 'llama3.1:latest'
 
+        recent_history, summary = self.context.build(history)
+        if summary:
+            summary = f"[Resumo da conversa anterior: {summary}]"
+            system_instruction = f"{system_instruction}\n\n{summary}" if system_instruction else summary
+
         messages = []
         if system_instruction:
             messages.append({"role": "system", "content": system_instruction})
-
-        if history:
-            recent_history = history[-12:]
-            for item in recent_history:
-                role = item.get('role')
-                content = item.get('content', '').strip()
-                if role in {'user', 'assistant'} and content:
-                    messages.append({"role": role, "content": content})
-
+        messages.extend(recent_history)
         messages.append({"role": "user", "content": message})
 
-        payload = {
+        return {
             "model": model_name,
             "messages": messages,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": max(0, min(2, temperature))
             }
         }
 
+    def _read_body(self, response, cancel):
+        """Corpo da resposta lido em pedaços; None se a corrida acabou no meio da leitura"""
+        response.encoding = response.encoding or 'utf-8'
+        parts = []
+        for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+            if cancel is not None and cancel.is_set():
+                print("Tentativa abandonada: a corrida já terminou")
+                return None
+            if chunk:
+                parts.append(chunk)
+        return "".join(parts)
+
+    def _ollama_chat(self, message, history, system_instruction, model, temperature, timeout=None, cancel=None):
+        payload = self._ollama_payload(message, history, system_instruction, model, temperature, stream=False)
+
         try:
-            response = requests.post(
+            with self.http.post(
                 f"{self.ollama_url}/api/chat",
                 json=payload,
-                timeout=min(self.timeout, 15)
-            )
+                stream=True,
+                timeout=min(timeout or self.timeout, self.ollama_timeout)
+            ) as response:
+                body = self._read_body(response, cancel) if response.status_code == 200 else None
 
             if response.status_code == 200:
-                data = response.json()
+                if body is None:
+                    return None
+                data = json.loads(body)
                 content = ''
                 if isinstance(data, dict):
                     message_block = data.get('message') or {}
@@ -127,14 +484,57 @@ class ChatEngine:
                 print("Ollama retornou resposta vazia")
             else:
                 print(f"Ollama falhou com status {response.status_code}")
+                if response.status_code >= 500:
+                    raise ProviderUnavailable(f"Ollama HTTP {response.status_code}")
 
+        except ProviderUnavailable:
+            raise
         except (requests.Timeout, requests.ConnectionError) as e:
             print(f"Timeout/Conexão no Ollama: {e}")
+            raise ProviderUnavailable(str(e)) from e
         except Exception as e:
             print(f"Erro inesperado no Ollama: {e}")
 
         return None
 
+    def _ollama_stream(self, message, history, system_instruction, model, temperature, deadline=None):
+        """Resposta do Ollama em NDJSON (uma linha JSON por pedaço, a última com "done": true)"""
+        payload = self._ollama_payload(message, history, system_instruction, model, temperature, stream=True)
+
+        try:
+            with self.http.post(
+                f"{self.ollama_url}/api/chat",
+                json=payload,
+                stream=True,
+                timeout=self._stream_timeout(min(self.timeout, self.ollama_timeout), deadline)
+            ) as response:
+                if response.status_code != 200:
+                    print(f"Ollama (stream) falhou com status {response.status_code}")
+                    if response.status_code >= 500:
+                        raise ProviderUnavailable(f"Ollama HTTP {response.status_code}")
+                    return
+
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get('error'):
+                        print(f"Ollama (stream) retornou erro: {data['error']}")
+                        return
+                    content = (data.get('message') or {}).get('content', '')
+                    if content:
+                        yield content
+                    if data.get('done'):
+                        return
+
+        except ProviderUnavailable:
+            raise
+        except (requests.Timeout, requests.ConnectionError) as e:
+            print(f"Timeout/Conexão no Ollama (stream): {e}")
+            raise ProviderUnavailable(str(e)) from e
+        except Exception as e:
+            print(f"Erro inesperado no Ollama (stream): {e}")
+
     def _build_prompt(self, message, history, system_instruction):
         if not system_instruction:
             system_instruction = (
@@ -145,29 +545,32 @@ class ChatEngine:
 
         prompt_parts = [f"Instruction: {system_instruction}", ""]
 
-        if history:
-            recent_history = history[-8:]
-            for item in recent_history:
-                role = 'User' if item.get('role') == 'user' else 'AI'
-                content = item.get('content', '').strip()
-                if content:
-                    prompt_parts.append(f"{role}: {content}")
+        recent_history, summary = self.context.build(history)
+        if summary:
+            prompt_parts.extend([f"Summary: {summary}", ""])
+        for item in recent_history:
+            role = 'User' if item['role'] == 'user' else 'AI'
+            prompt_parts.append(f"{role}: {item['content']}")
 
         prompt_parts.append(f"User: {message}")
         prompt_parts.append("AI:")
         return "\n".join(prompt_parts)
 
-    def _pollinations_post(self, prompt, attempt):
+    def _pollinations_post(self, prompt, attempt, timeout=None, cancel=None):
         try:
-            response = requests.post(
+            with self.http.post(
                 self.base_url,
                 data=prompt.encode('utf-8'),
                 headers={'Content-Type': 'text/plain; charset=utf-8'},
-                timeout=self.timeout
-            )
+                stream=True,
+                timeout=timeout or self.timeout
+            ) as response:
+                body = self._read_body(response, cancel) if response.status_code == 200 else None
 
             if response.status_code == 200:
-                result = response.text.strip()
+                if body is None:
+                    return None
+                result = body.strip()
                 if result:
                     print(f"POST sucesso (tentativa {attempt + 1})")
                     return result
@@ -175,24 +578,58 @@ class ChatEngine:
 
             elif response.status_code >= 500:
                 print(f"Erro 5xx do servidor (tentativa {attempt + 1})")
+                raise ProviderUnavailable(f"Pollinations HTTP {response.status_code}")
 
             elif response.status_code == 429:
-                print("Limite de requisições atingido (429). Esperando mais antes de tentar novamente.")
-                time.sleep(4)
+                # Sem esperar aqui: o hedging parte para a próxima tentativa
+                print("Limite de requisições atingido (429).")
 
             else:
                 print(f"Erro {response.status_code} no POST, interrompendo POST attempts")
                 return None
 
+        except ProviderUnavailable:
+            raise
+
         except (requests.Timeout, requests.ConnectionError) as e:
             print(f"Timeout/Conexão tentativa {attempt + 1}: {e}")
+            raise ProviderUnavailable(str(e)) from e
 
         except Exception as e:
             print(f"Erro inesperado no POST: {e}")
 
         return None
 
-    def _pollinations_get(self, message, system_instruction):
+    def _pollinations_stream(self, prompt, deadline=None):
+        """POST ao Pollinations lendo o corpo em pedaços (transfer-encoding chunked)"""
+        try:
+            with self.http.post(
+                self.base_url,
+                data=prompt.encode('utf-8'),
+                headers={'Content-Type': 'text/plain; charset=utf-8'},
+                stream=True,
+                timeout=self._stream_timeout(self.timeout, deadline)
+            ) as response:
+                if response.status_code != 200:
+                    print(f"POST (stream) falhou com status {response.status_code}")
+                    if response.status_code >= 500:
+                        raise ProviderUnavailable(f"Pollinations HTTP {response.status_code}")
+                    return
+
+                response.encoding = response.encoding or 'utf-8'
+                for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                    if chunk:
+                        yield chunk
+
+        except ProviderUnavailable:
+            raise
+        except (requests.Timeout, requests.ConnectionError) as e:
+            print(f"Timeout/Conexão no POST (stream): {e}")
+            raise ProviderUnavailable(str(e)) from e
+        except Exception as e:
+            print(f"Erro inesperado no POST (stream): {e}")
+
+    def _pollinations_get(self, message, system_instruction, timeout=None, cancel=None):
         print("Usando fallback GET...")
         if not system_instruction:
             system_instruction = "Você é Karen, uma assistente espirituosa que responde em português."
@@ -207,17 +644,26 @@ class ChatEngine:
         url = f"{self.base_url}{encoded_prompt}"
 
         try:
-            response = requests.get(url, timeout=self.timeout)
+            with self.http.get(url, stream=True, timeout=timeout or self.timeout) as response:
+                body = self._read_body(response, cancel) if response.status_code == 200 else None
+
             if response.status_code == 200:
-                result = response.text.strip()
+                if body is None:
+                    return None
+                result = body.strip()
                 if result:
                     print("GET sucesso")
                     return result
                 print("GET retornou vazio")
             else:
                 print(f"GET falhou com status {response.status_code}")
+                if response.status_code >= 500:
+                    raise ProviderUnavailable(f"Pollinations HTTP {response.status_code}")
+        except ProviderUnavailable:
+            raise
         except (requests.Timeout, requests.ConnectionError) as e:
             print(f"Timeout/Conexão no GET: {e}")
+            raise ProviderUnavailable(str(e)) from e
         except Exception as e:
             print(f"Erro inesperado no GET: {e}")
 
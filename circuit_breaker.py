@@ -0,0 +1,193 @@
+"""
+Circuit Breaker dos Provedores de Chat
+Acompanha erros e latência recentes de cada provedor (Pollinations, Ollama).
+Provedor com muitas falhas abre o circuito e é pulado na hora, em vez de
+cada chamada esperar o timeout; um probe em segundo plano detecta a volta
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Janela deslizante das últimas `window` chamadas. Abre quando a taxa de erro
+    (ou de chamadas lentas) passa do limite; depois de `open_seconds` deixa uma
+    chamada de teste passar (half-open): sucesso fecha, falha reabre.
+    """
+
+    def __init__(self, name, window=20, min_calls=5, error_threshold=0.5,
+                 slow_call_seconds=None, slow_threshold=0.8, open_seconds=30):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_threshold = error_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
+        self._calls = deque(maxlen=window)  # (ok, latência)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """A chamada pode seguir? (em half-open só uma de cada vez)"""
+        with self._lock:
+            if self.state == OPEN and time.time() - self.opened_at >= self.open_seconds:
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency=None):
+        with self._lock:
+            if self.state != CLOSED:
+                self._close()
+            self._calls.append((True, latency))
+            if self._should_trip():
+                self._open()
+
+    def record_failure(self, latency=None):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self._calls.append((False, latency))
+            if self.state == CLOSED and self._should_trip():
+                self._open()
+
+    def release(self):
+        """Chamada sem veredito (429, resposta vazia, cancelada): libera a vaga de teste do half-open"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reopen(self):
+        """Probe falhou: mantém aberto e reinicia o tempo de espera"""
+        with self._lock:
+            self._open()
+
+    def _should_trip(self):
+        if len(self._calls) < self.min_calls:
+            return False
+        failures = sum(1 for ok, _ in self._calls if not ok)
+        if failures / len(self._calls) >= self.error_threshold:
+            return True
+        if self.slow_call_seconds:
+            slow = sum(1 for _, latency in self._calls if latency and latency > self.slow_call_seconds)
+            if slow / len(self._calls) >= self.slow_threshold:
+                return True
+        return False
+
+    def _open(self):
+        if self.state != OPEN:
+            self.trips += 1
+            print(f"Circuito '{self.name}' aberto")
+        self.state = OPEN
+        self.opened_at = time.time()
+        self._probe_in_flight = False
+
+    def _close(self):
+        print(f"Circuito '{self.name}' fechado")
+        self.state = CLOSED
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._calls.clear()
+
+    def stats(self):
+        with self._lock:
+            calls = list(self._calls)
+            latencies = sorted(latency for ok, latency in calls if ok and latency is not None)
+            return {
+                "state": self.state,
+                "calls": len(calls),
+                "error_rate": round(sum(1 for ok, _ in calls if not ok) / len(calls), 3) if calls else 0.0,
+                "p50_latency": round(latencies[len(latencies) // 2], 3) if latencies else None,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "open_for": round(time.time() - self.opened_at, 1) if self.opened_at else None,
+            }
+
+
+class ProviderHealth:
+    """
+    Breakers por provedor + thread de health probes. Só provedores com o
+    circuito aberto são sondados; probe bem-sucedido fecha o circuito.
+    """
+
+    def __init__(self, probe_interval=None):
+        if probe_interval is None:
+            probe_interval = float(os.environ.get('CHAT_PROBE_INTERVAL', 10))
+        self.probe_interval = probe_interval
+        self._breakers = {}
+        self._probes = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def register(self, name, probe=None, **breaker_kwargs):
+        """Cria o breaker do provedor (uma vez); `probe()` devolve True se o provedor respondeu"""
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **breaker_kwargs)
+            if probe is not None:
+                self._probes[name] = probe
+            if self._probes and self._thread is None:
+                self._thread = threading.Thread(target=self._probe_loop, name="provider-health", daemon=True)
+                self._thread.start()
+            return self._breakers[name]
+
+    def breaker(self, name):
+        with self._lock:
+            return self._breakers.get(name)
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                targets = [(self._breakers[name], probe) for name, probe in self._probes.items()]
+            for breaker, probe in targets:
+                if breaker.state == CLOSED:
+                    continue
+                started = time.time()
+                try:
+                    healthy = probe()
+                except Exception:
+                    healthy = False
+                if healthy:
+                    breaker.record_success(time.time() - started)
+                else:
+                    breaker.reopen()
+
+    def stats(self):
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+_health = None
+_health_lock = threading.Lock()
+
+
+def get_provider_health():
+    """Registro de saúde dos provedores do processo (compartilhado entre ChatEngines)"""
+    global _health
+    with _health_lock:
+        if _health is None:
+            _health = ProviderHealth()
+        return _health
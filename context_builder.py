@@ -0,0 +1,197 @@
+"""
+Montagem do Contexto do Chat
+Em vez de cortar o histórico num número fixo de mensagens, conta tokens e
+preenche um orçamento da mensagem mais recente para trás. Turnos que não
+cabem viram um resumo curto (uma linha por turno), também limitado em tokens
+"""
+
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+")
+
+
+class TokenCounter:
+    """
+    Conta tokens com o tokenizer do transformers (carregado só no primeiro uso e
+    só de arquivos locais); sem ele, aproxima por regex (~4 caracteres por token).
+    Contagens por texto ficam num LRU, então cada mensagem é contada uma vez.
+    """
+
+    def __init__(self, model_name=None, max_entries=4096):
+        if model_name is None:
+            model_name = os.environ.get('CHAT_TOKENIZER', 'gpt2')
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._tokenizer = None
+        self._load_attempted = False
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Tenta carregar o tokenizer uma única vez (sem baixar nada)"""
+        if self._load_attempted:
+            return self._tokenizer
+        with self._load_lock:
+            if not self._load_attempted and self.model_name:
+                try:
+                    from transformers import AutoTokenizer
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.model_name, local_files_only=True)
+                    print(f"Tokenizer do chat: {self.model_name}")
+                except Exception as e:
+                    print(f"Tokenizer indisponível ({e}). Usando contagem aproximada.")
+            self._load_attempted = True
+        return self._tokenizer
+
+    @staticmethod
+    def approximate(text):
+        return sum(max(1, math.ceil(len(piece) / 4)) for piece in _WORD_RE.findall(text))
+
+    def _count(self, text):
+        tokenizer = self._load()
+        if tokenizer is not None:
+            try:
+                return len(tokenizer.encode(text, add_special_tokens=False))
+            except Exception:
+                pass
+        return self.approximate(text)
+
+    def count(self, text):
+        if not text:
+            return 0
+        with self._lock:
+            cached = self._counts.get(text)
+            if cached is not None:
+                self._counts.move_to_end(text)
+                self.hits += 1
+                return cached
+
+        tokens = self._count(text)
+
+        with self._lock:
+            self.misses += 1
+            self._counts[text] = tokens
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def stats(self):
+        return {
+            "tokenizer": self.model_name if self._tokenizer is not None else "approximate",
+            "cached_counts": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ContextBuilder:
+    """
+    `build(history)` devolve (mensagens que cabem em `max_tokens`, resumo dos
+    turnos anteriores em até `summary_tokens`). Cada mensagem custa seus tokens
+    mais `message_overhead` (papel e separadores).
+    """
+
+    def __init__(self, max_tokens=None, summary_tokens=None, counter=None,
+                 message_overhead=4, summary_words=24):
+        if max_tokens is None:
+            max_tokens = int(os.environ.get('CHAT_CONTEXT_TOKENS', 1500))
+        if summary_tokens is None:
+            summary_tokens = int(os.environ.get('CHAT_SUMMARY_TOKENS', 200))
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.counter = counter or TokenCounter()
+        self.message_overhead = message_overhead
+        self.summary_words = summary_words
+
+    def message_tokens(self, message):
+        return self.counter.count(message["content"]) + self.message_overhead
+
+    def build(self, history):
+        messages = [
+            {"role": item.get('role'), "content": (item.get('content') or '').strip()}
+            for item in history or []
+            if isinstance(item, dict) and item.get('role') in {'user', 'assistant'}
+        ]
+        messages = [m for m in messages if m["content"]]
+
+        budget = self.max_tokens
+        start = len(messages)
+        while start > 0:
+            cost = self.message_tokens(messages[start - 1])
+            if cost > budget:
+                break
+            budget -= cost
+            start -= 1
+
+        return messages[start:], self.summarize(messages[:start])
+
+    def _summary_line(self, message):
+        """Primeira frase do turno, cortada em `summary_words` palavras"""
+        label = "Usuário" if message["role"] == 'user' else "IA"
+        first = _SENTENCE_RE.split(message["content"], maxsplit=1)[0]
+        words = first.split()
+        if len(words) > self.summary_words:
+            first = " ".join(words[:self.summary_words]) + "…"
+        return f"{label}: {first}"
+
+    def summarize(self, older, max_tokens=None):
+        """Resumo rolante em até `max_tokens`: os turnos mais recentes têm prioridade"""
+        budget = self.summary_tokens if max_tokens is None else max_tokens
+        if not older or budget <= 0:
+            return ""
+        lines = []
+        for message in reversed(older):
+            line = self._summary_line(message)
+            cost = self.counter.count(line)
+            if cost > budget:
+                # Turno longo não esvazia o resumo: corta no que resta ou passa para o próximo
+                line = self._clip(line, budget)
+                if not line:
+                    continue
+                cost = self.counter.count(line)
+            budget -= cost
+            lines.append(line)
+            if budget <= 0:
+                break
+        return " | ".join(reversed(lines))
+
+    def _clip(self, line, budget):
+        """Maior prefixo (em palavras, com "…") de `line` que cabe em `budget` tokens"""
+        words = line.split()
+        best = ""
+        low, high = 2, len(words) - 1  # pelo menos "rótulo: palavra"
+        while low <= high:
+            middle = (low + high) // 2
+            clipped = " ".join(words[:middle]) + "…"
+            if self.counter.count(clipped) <= budget:
+                best, low = clipped, middle + 1
+            else:
+                high = middle - 1
+        return best
+
+    def stats(self):
+        return {
+            "max_tokens": self.max_tokens,
+            "summary_tokens": self.summary_tokens,
+            **self.counter.stats(),
+        }
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_context_builder():
+    """Montador de contexto do processo (compartilha o cache de contagens)"""
+    global _builder
+    with _builder_lock:
+        if _builder is None:
+            _builder = ContextBuilder()
+        return _builder
@@ -0,0 +1,138 @@
+"""
+Memória de Conversa da IA
+Guarda só os turnos recentes num buffer circular. Turnos que saem do buffer
+são resumidos em lotes como notas de longo prazo (também limitadas), então
+o uso de memória não cresce com o tempo de servidor no ar
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from context_builder import get_context_builder
+
+
+class Turn:
+    """Um turno da conversa (slots: sem __dict__ por mensagem; horário em epoch)"""
+
+    __slots__ = ("role", "content", "created_at")
+
+    def __init__(self, role, content, created_at=None):
+        self.role = role
+        self.content = content
+        self.created_at = time.time() if created_at is None else created_at
+
+    def to_dict(self):
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": datetime.fromtimestamp(self.created_at).isoformat(),
+        }
+
+
+class Note:
+    """Resumo de um lote de turnos antigos"""
+
+    __slots__ = ("text", "turns", "started_at", "ended_at")
+
+    def __init__(self, text, turns, started_at, ended_at):
+        self.text = text
+        self.turns = turns
+        self.started_at = started_at
+        self.ended_at = ended_at
+
+    def to_dict(self):
+        return {
+            "text": self.text,
+            "turns": self.turns,
+            "from": datetime.fromtimestamp(self.started_at).isoformat(),
+            "until": datetime.fromtimestamp(self.ended_at).isoformat(),
+        }
+
+
+class ConversationMemory:
+    """
+    `max_turns` turnos recentes em memória; a cada `summarize_every` turnos
+    descartados, uma nota com o resumo deles (até `note_tokens` tokens).
+    As `max_notes` notas mais recentes são mantidas.
+    """
+
+    def __init__(self, max_turns=None, max_notes=None, summarize_every=10, note_tokens=120, builder=None):
+        if max_turns is None:
+            max_turns = int(os.environ.get('CHAT_MEMORY_TURNS', 100))
+        if max_notes is None:
+            max_notes = int(os.environ.get('CHAT_MEMORY_NOTES', 50))
+        self.max_turns = max(2, max_turns)
+        self.summarize_every = max(1, summarize_every)
+        self.note_tokens = note_tokens
+        self.builder = builder or get_context_builder()
+
+        self._turns = deque()
+        self._evicted = []
+        self._notes = deque(maxlen=max(1, max_notes))
+        self._lock = threading.Lock()
+        self.total_turns = 0
+        self.user_turns = 0
+
+    def append(self, role, content):
+        with self._lock:
+            self._turns.append(Turn(role, content))
+            self.total_turns += 1
+            if role == 'user':
+                self.user_turns += 1
+            while len(self._turns) > self.max_turns:
+                self._evicted.append(self._turns.popleft())
+            if len(self._evicted) >= self.summarize_every:
+                self._compact()
+
+    def _compact(self):
+        """Resume os turnos descartados numa nota (chamado com o lock)"""
+        evicted, self._evicted = self._evicted, []
+        text = self.builder.summarize(
+            [{"role": turn.role, "content": turn.content.strip()} for turn in evicted if turn.content.strip()],
+            max_tokens=self.note_tokens,
+        )
+        if text:
+            self._notes.append(Note(text, len(evicted), evicted[0].created_at, evicted[-1].created_at))
+
+    def messages(self):
+        """Turnos recentes no formato do chat engine, do mais antigo ao mais novo"""
+        with self._lock:
+            return [{"role": turn.role, "content": turn.content} for turn in self._turns]
+
+    def notes(self, limit=None):
+        """Textos das notas de longo prazo mais recentes, em ordem cronológica"""
+        with self._lock:
+            notes = list(self._notes)
+        if limit is not None:
+            notes = notes[-limit:] if limit > 0 else []
+        return [note.text for note in notes]
+
+    def page(self, limit=20, offset=0):
+        """Turnos do mais novo ao mais antigo: (itens, has_more)"""
+        with self._lock:
+            total = len(self._turns)
+            end = max(0, total - offset)
+            start = max(0, end - limit)
+            turns = [self._turns[i] for i in range(end - 1, start - 1, -1)]
+        return [turn.to_dict() for turn in turns], start > 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "turns": len(self._turns),
+                "max_turns": self.max_turns,
+                "pending_summary": len(self._evicted),
+                "notes": len(self._notes),
+                "max_notes": self._notes.maxlen,
+                "total_turns": self.total_turns,
+            }
+
+    def note_dicts(self):
+        with self._lock:
+            return [note.to_dict() for note in self._notes]
+
+    def __len__(self):
+        return len(self._turns)
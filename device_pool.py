@@ -0,0 +1,91 @@
+"""
+Pool de Pipelines por Dispositivo
+Mantém residentes os pipelines já carregados (cuda, cpu...) para que
+trocar de backend entre requisições não recarregue o modelo do zero
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+def _is_oom(error):
+    return isinstance(error, MemoryError) or "out of memory" in str(error).lower()
+
+
+class DevicePool:
+    """
+    Cache LRU de pipelines. `loader(key)` constrói o pipeline de uma chave
+    (dispositivo, ou dispositivo:precisão no caso da CUDA). Só descarta o menos usado quando
+    o limite de residentes é atingido ou há pressão de memória.
+    """
+
+    def __init__(self, loader, memory_policy, max_resident=None, on_evict=None):
+        if max_resident is None:
+            max_resident = int(os.environ.get('MAX_RESIDENT_PIPELINES', 2))
+        self.loader = loader
+        self.memory = memory_policy
+        self.on_evict = on_evict
+        self.max_resident = max(1, max_resident)
+        self._pipes = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def acquire(self, key):
+        """Devolve o pipeline já aquecido da chave, carregando se necessário"""
+        with self._lock:
+            if key in self._pipes:
+                self._pipes.move_to_end(key)
+                self.hits += 1
+                return self._pipes[key]
+
+            while len(self._pipes) >= self.max_resident:
+                self._evict_lru()
+            if self._pipes and self.memory.should_reclaim():
+                self._evict_lru()
+
+            try:
+                pipe = self.loader(key)
+            except Exception as e:
+                if not (_is_oom(e) and self._pipes):
+                    raise
+                # Sem memória para mais um modelo: libera o menos usado e tenta de novo
+                print(f"Memória insuficiente para carregar '{key}', liberando pipeline antigo...")
+                self._evict_lru()
+                pipe = self.loader(key)
+
+            self.loads += 1
+            self._pipes[key] = pipe
+            return pipe
+
+    def evict(self, key):
+        with self._lock:
+            if key in self._pipes:
+                del self._pipes[key]
+                self._evicted(key)
+
+    def _evict_lru(self):
+        key, _ = self._pipes.popitem(last=False)
+        print(f"--- Pipeline '{key}' removido da memória (LRU) ---")
+        self._evicted(key)
+
+    def _evicted(self, key):
+        self.evictions += 1
+        if self.on_evict:
+            self.on_evict(key)
+        self.memory.on_model_swap()
+
+    def resident(self):
+        with self._lock:
+            return [str(key) for key in self._pipes]
+
+    def stats(self):
+        return {
+            "resident": self.resident(),
+            "max_resident": self.max_resident,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
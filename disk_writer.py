@@ -0,0 +1,149 @@
+"""
+Gravação de Imagens em Segundo Plano
+Codifica (PNG/WebP) e grava imagem + prompt .txt num thread próprio,
+tirando o zlib e a latência de disco do caminho da requisição
+"""
+
+import atexit
+import io
+import os
+import queue
+import threading
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Fila limitada de gravações com um thread escritor.
+    `submit()` devolve um Future com os bytes codificados, que servem
+    para base64/cache sem codificar a imagem de novo.
+    """
+
+    def __init__(self, image_format=None, compress_level=None, webp_quality=None,
+                 fsync=None, max_pending=32):
+        if image_format is None:
+            image_format = os.environ.get('IMAGE_FORMAT', 'png')
+        if compress_level is None:
+            compress_level = int(os.environ.get('PNG_COMPRESS_LEVEL', 6))
+        if webp_quality is None:
+            webp_quality = int(os.environ.get('WEBP_QUALITY', 90))
+        if fsync is None:
+            fsync = os.environ.get('IMAGE_FSYNC', '0') == '1'
+
+        self.image_format = 'webp' if image_format.lower() == 'webp' else 'png'
+        self.compress_level = max(0, min(9, compress_level))
+        self.webp_quality = max(1, min(100, webp_quality))
+        self.fsync = fsync
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="image-disk-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def extension(self):
+        return self.image_format
+
+    def submit(self, image, path, prompt=None, on_written=None):
+        """
+        Agenda a gravação de `image` em `path` (e do prompt em .txt ao lado).
+        `on_written(path, data)` roda no thread escritor depois do arquivo estar no disco
+        e do Future resolvido; erros dele são só registrados.
+        Bloqueia se houver gravações demais pendentes (backpressure).
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BackgroundWriter já foi encerrado")
+            self._pending[os.path.abspath(path)] = future
+        self._queue.put((image, path, prompt, on_written, future))
+        return future
+
+    def wait_for(self, path, timeout=10):
+        """Espera a gravação pendente de `path` (se houver) terminar"""
+        with self._lock:
+            future = self._pending.get(os.path.abspath(path))
+        if future is not None:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Bloqueia até todas as gravações enfileiradas terminarem"""
+        self._queue.join()
+
+    def close(self):
+        """Drena a fila e encerra o thread (chamado no desligamento)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def encode(self, image):
+        buffered = io.BytesIO()
+        if self.image_format == 'webp':
+            image.save(buffered, format="WEBP", quality=self.webp_quality, method=4)
+        else:
+            image.save(buffered, format="PNG", compress_level=self.compress_level)
+        return buffered.getvalue()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is _STOP:
+                    return
+                self._write(*task)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, image, path, prompt, on_written, future):
+        try:
+            data = self.encode(image)
+            self._write_file(path, data)
+
+            if prompt is not None:
+                txt_path = os.path.splitext(path)[0] + ".txt"
+                try:
+                    self._write_file(txt_path, prompt.encode("utf-8"))
+                except Exception as e:
+                    print(f"Erro ao salvar prompt txt: {e}")
+
+            print(f"Imagem salva em: {path}")
+        except Exception as e:
+            print(f"Erro ao gravar imagem {path}: {e}")
+            future.set_exception(e)
+            with self._lock:
+                self._pending.pop(os.path.abspath(path), None)
+            return
+
+        # Arquivo já está no disco: libera quem espera os bytes antes das miniaturas/índices
+        future.set_result(data)
+        try:
+            if on_written:
+                on_written(path, data)
+        except Exception as e:
+            print(f"Erro pós-gravação de {path}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(os.path.abspath(path), None)
+
+    def _write_file(self, path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
@@ -0,0 +1,62 @@
+"""
+Cache de Embeddings de Prompt
+Guarda a saída do text encoder (CLIP) por (modelo, prompt, prompt negativo)
+para não recodificar prompts repetidos a cada geração
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+
+class PromptEmbeddingCache:
+    """LRU de pares (prompt_embeds, negative_prompt_embeds) com contagem de hits/misses"""
+
+    def __init__(self, max_entries=None):
+        if max_entries is None:
+            max_entries = int(os.environ.get('PROMPT_EMBEDDING_CACHE_SIZE', 256))
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_encode(self, model_key, prompt, negative_prompt, encode_fn):
+        """
+        Devolve os embeddings do cache ou chama `encode_fn(prompt, negative_prompt)`,
+        que deve retornar (prompt_embeds, negative_prompt_embeds).
+        """
+        key = (model_key, prompt, negative_prompt or "")
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        embeds = encode_fn(prompt, negative_prompt)
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = embeds
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return embeds
+
+    def clear(self, model_key=None):
+        """Esquece tudo (ou só os embeddings de um modelo que saiu da memória)"""
+        with self._lock:
+            if model_key is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == model_key]:
+                del self._entries[key]
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
@@ -2,207 +2,390 @@ import torch
 from diffusers import StableDiffusionPipeline, AutoencoderKL
 from PIL import Image
 import io
-import base64
-import gc
 import time
 import os
 import re
-import requests # Necessário para API Premium
+import random
+from contextlib import contextmanager
+from http_client import get_client # Sessão HTTP compartilhada (API Premium)
 from datetime import datetime
+from memory_policy import MemoryPolicy
+from device_pool import DevicePool
+from embedding_cache import PromptEmbeddingCache
+from disk_writer import BackgroundWriter
+
+MODEL_ID = "runwayml/stable-diffusion-v1-5"
+
+# Precisões aceitas no caminho CUDA (a CPU sempre roda em float32)
+PRECISIONS = {
+    "fp32": torch.float32,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+}
 
 class ImageGenerator:
-    def __init__(self):
-        self.current_progress = 0
+    def __init__(self, precision=None, writer=None):
         self.current_device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.pipe = None
-        self.stop_signal = False
+        # fp16/bf16 na UNet e no text encoder, VAE sempre em fp32
+        precision = (precision or os.environ.get("IMAGE_PRECISION", "fp16")).lower()
+        self.precision = precision if precision in PRECISIONS else "fp32"
+        self._last_timestamp = None
+        self._timestamp_seq = 0
+        self.memory = MemoryPolicy()
+        # Codificação e gravação em disco num thread próprio
+        self.writer = writer or BackgroundWriter()
+        # Avisado quando uma imagem termina de ser gravada: on_image_saved(filename, prompt, image)
+        self.on_image_saved = None
+        self.embeddings = PromptEmbeddingCache()
+        self.pool = DevicePool(self._build_pipeline, self.memory, on_evict=self._forget_embeddings)
         self.load_model(self.current_device)
 
     def load_model(self, target_device):
-        print(f"--- Carregando modelo no dispositivo: {target_device} ---")
-        
-        # Limpa memória antiga
-        if self.pipe is not None:
-            del self.pipe
-            self.pipe = None
-            gc.collect()
-            torch.cuda.empty_cache()
-
+        """
+        Aquece o pipeline do dispositivo na precisão padrão (carrega só se não estiver
+        residente). Nenhuma referência fica guardada aqui: o pool é o único dono dos
+        pipelines, então o que ele despeja é liberado de fato.
+        """
         # Se for API Premium, não carrega modelo local
         if target_device == "nano-banana":
             self.current_device = target_device
             print("--- Modo API Premium (Nano Banana) Ativado ---")
             return
 
-        model_id = "runwayml/stable-diffusion-v1-5"
-        
         try:
-            if target_device == "cuda":
-                from diffusers import DPMSolverMultistepScheduler
-
-                # 1. Carrega em Float32 (Elimina Tela Preta e Erros de Tipo)
-                self.pipe = StableDiffusionPipeline.from_pretrained(
-                    model_id, 
-                    torch_dtype=torch.float32, # Precisão total para estabilidade
-                    use_safetensors=True,
-                    safety_checker=None, 
-                    requires_safety_checker=False
-                )
-
-                # 2. Scheduler DPM++ (Recupera a velocidade)
-                # Permite usar steps=20 com alta qualidade
-                self.pipe.scheduler = DPMSolverMultistepScheduler.from_config(
-                    self.pipe.scheduler.config, 
-                    use_karras_sigmas=True
-                )
-
-                # 3. Otimização de Memória Rápida
-                # 'model_cpu_offload' é muito melhor que 'sequential'.
-                # Ele mantém o modelo pronto na RAM e joga para a VRAM instantaneamente.
-                self.pipe.enable_model_cpu_offload()
-                
-                # Otimizações extras
-                self.pipe.enable_vae_tiling() 
-                self.pipe.enable_attention_slicing()
-                
-            else:
-                # CPU Fallback
-                self.pipe = StableDiffusionPipeline.from_pretrained(
-                    model_id, 
-                    use_safetensors=True,
-                    safety_checker=None,
-                    requires_safety_checker=False
-                )
-                self.pipe.to("cpu")
-            
+            self.pool.acquire(self._pipeline_key(target_device))
             self.current_device = target_device
-            print("--- Modelo carregado (Modo Compatibilidade Total) ---")
-            
         except Exception as e:
             print(f"Erro ao carregar modelo: {e}")
 
+    def _forget_embeddings(self, key):
+        """Pipeline saiu do pool: descarta os embeddings dele (inclusive os do retry em fp32)"""
+        self.embeddings.clear(key)
+        self.embeddings.clear(f"{key}+fp32")
+
+    def _pipeline_key(self, device, precision=None):
+        """Chave do pool: dispositivo + precisão (na CPU a precisão é sempre fp32)"""
+        if device != "cuda":
+            return device
+        return f"{device}:{precision or self.precision}"
+
+    def _build_pipeline(self, key):
+        target_device, _, precision = key.partition(":")
+        print(f"--- Carregando modelo no dispositivo: {key} ---")
+        model_id = MODEL_ID
+        
+        if target_device == "cuda":
+            from diffusers import DPMSolverMultistepScheduler
+
+            # 1. UNet e text encoder na precisão escolhida (fp32 = compatibilidade total)
+            dtype = PRECISIONS.get(precision, torch.float32)
+            pipe = StableDiffusionPipeline.from_pretrained(
+                model_id, 
+                torch_dtype=dtype,
+                use_safetensors=True,
+                safety_checker=None, 
+                requires_safety_checker=False
+            )
+
+            # A VAE em meia precisão é a causa clássica da Tela Preta/NaN:
+            # ela fica em float32 e a decodificação é feita à parte (_decode_latents)
+            pipe.vae.to(dtype=torch.float32)
+
+            # Channels-last acelera as convoluções da UNet nos Tensor Cores
+            pipe.unet.to(memory_format=torch.channels_last)
+
+            # 2. Scheduler DPM++ (Recupera a velocidade)
+            # Permite usar steps=20 com alta qualidade
+            pipe.scheduler = DPMSolverMultistepScheduler.from_config(
+                pipe.scheduler.config, 
+                use_karras_sigmas=True
+            )
+
+            # 3. Otimização de Memória Rápida
+            # 'model_cpu_offload' é muito melhor que 'sequential'.
+            # Ele mantém o modelo pronto na RAM e joga para a VRAM instantaneamente.
+            pipe.enable_model_cpu_offload()
+            
+            # Otimizações extras
+            pipe.enable_vae_tiling() 
+            pipe.enable_attention_slicing()
+            
+        else:
+            # CPU Fallback
+            pipe = StableDiffusionPipeline.from_pretrained(
+                model_id, 
+                use_safetensors=True,
+                safety_checker=None,
+                requires_safety_checker=False
+            )
+            pipe.to("cpu")
+        
+        print(f"--- Modelo carregado ({key}) ---")
+        return pipe
+
     def switch_device(self, device_name):
+        # Só troca o dispositivo: generate_batch pede ao pool o pipeline na precisão
+        # efetiva do pedido (carregar aqui na padrão deixaria um modelo residente sem uso)
         if device_name != self.current_device:
             self.current_device = device_name
-            self.load_model(device_name)
+            if device_name == "nano-banana":
+                print("--- Modo API Premium (Nano Banana) Ativado ---")
         return self.current_device
 
+    def _unique_timestamp(self):
+        """Timestamp do nome do arquivo; imagens do mesmo lote/segundo ganham sufixo"""
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        if timestamp == self._last_timestamp:
+            self._timestamp_seq += 1
+            return f"{timestamp}-{self._timestamp_seq}"
+        self._last_timestamp = timestamp
+        self._timestamp_seq = 0
+        return timestamp
+
     def _save_to_disk(self, image, prompt):
+        """
+        Agenda a gravação no BackgroundWriter e devolve (nome do arquivo, Future com os bytes).
+        A codificação PNG/WebP e o .txt do prompt saem do caminho da requisição.
+        """
         folder_name = "imagens_geradas"
         if not os.path.exists(folder_name):
             os.makedirs(folder_name)
 
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        timestamp = self._unique_timestamp()
         # Limita o nome do arquivo para evitar erros, mas salva o prompt inteiro no txt
         safe_prompt = re.sub(r'[\\/*?:"<>|]', "", prompt)[:30].replace(" ", "_")
-        filename = f"{timestamp}_{safe_prompt}.png"
+        filename = f"{timestamp}_{safe_prompt}.{self.writer.extension}"
         
         path = os.path.join(folder_name, filename)
-        image.save(path)
-        
-        # --- NOVO: Salva o prompt completo em um arquivo de texto ---
-        txt_filename = f"{timestamp}_{safe_prompt}.txt"
-        txt_path = os.path.join(folder_name, txt_filename)
-        try:
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(prompt)
-        except Exception as e:
-            print(f"Erro ao salvar prompt txt: {e}")
-            
-        print(f"Imagem salva em: {path}")
 
+        def on_written(path, data):
+            if self.on_image_saved:
+                self.on_image_saved(filename, prompt, image)
+
+        encoded = self.writer.submit(image, path, prompt, on_written=on_written)
+        return filename, encoded
 
-    def _generate_premium(self, prompt):
+    def _generate_premium(self, prompt, seed=None):
         """Gera imagem usando a API Premium (Nano Banana / Pollinations)"""
         print(f"🍌 Gerando via Nano Banana Premium (Modelo FLUX): '{prompt}'...")
         start_time = time.time()
         
         try:
             # Usando Pollinations.ai com o modelo FLUX (Melhor qualidade)
-            seed = int(time.time())
+            if seed is None:
+                seed = int(time.time())
             # Modelo Flux, resolução HD (1024x1024), enhance=true para melhorar prompt
             url = f"https://image.pollinations.ai/prompt/{prompt}?model=flux&width=1024&height=1024&seed={seed}&nologo=true&enhance=true"
             
             # Aumentado timeout para 60s para evitar erros de leitura
-            response = requests.get(url, timeout=60)
+            response = get_client().get(url, timeout=60)
             response.raise_for_status()
             
             image = Image.open(io.BytesIO(response.content))
             
             # Salva localmente para histórico
-            self._save_to_disk(image, prompt)
+            filename, encoded = self._save_to_disk(image, prompt)
             
             end_time = time.time()
             duration = round(end_time - start_time, 2)
             
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            
             return {
-                "image": img_str,
+                "encoded": encoded,
+                "filename": filename,
+                "format": self.writer.extension,
                 "duration": duration,
                 "device": "NANO BANANA (CLOUD)",
-                "steps": "N/A"
+                "steps": "N/A",
+                "seed": seed
             }
             
         except Exception as e:
             print(f"Erro na API Nano Banana: {e}")
             return None
 
-    def cancel(self):
-        """Ativa o sinal de parada"""
-        print("!!! SINAL DE CANCELAMENTO RECEBIDO !!!")
-        self.stop_signal = True
-
-    def generate(self, prompt, steps=20): # Reduzi steps padrão para 20 para testar mais rápido
+    def generate(self, prompt, steps=20, on_progress=None, cancel_event=None, seed=None, width=512, height=512, precision=None, negative_prompt=None): # Reduzi steps padrão para 20 para testar mais rápido
+        """
+        Gera uma imagem. `on_progress(pct)` recebe o progresso do job e
+        `cancel_event` (threading.Event) interrompe o loop no próximo passo.
+        """
         if self.current_device == "nano-banana":
-            return self._generate_premium(prompt)
+            return self._generate_premium(prompt, seed)
+
+        item = {
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "seed": seed,
+            "on_progress": on_progress,
+            "cancel_event": cancel_event
+        }
+        return self.generate_batch([item], steps=steps, width=width, height=height, precision=precision)[0]
+
+    def _encode_prompts(self, pipe, pipe_key, items):
+        """Embeddings do lote, reaproveitando o cache do text encoder"""
+        def encode(prompt, negative_prompt):
+            return pipe.encode_prompt(
+                prompt,
+                pipe._execution_device,
+                num_images_per_prompt=1,
+                do_classifier_free_guidance=True,
+                negative_prompt=negative_prompt or None
+            )
+
+        pairs = [
+            self.embeddings.get_or_encode(pipe_key, item["prompt"], item.get("negative_prompt"), encode)
+            for item in items
+        ]
+        prompt_embeds = torch.cat([pair[0] for pair in pairs])
+        negative_embeds = torch.cat([pair[1] for pair in pairs])
+        return prompt_embeds, negative_embeds
+
+    def _run_pipeline(self, pipe, pipe_key, items, steps, width, height, callback_fn):
+        """Roda a difusão até os latentes e decodifica na VAE em float32"""
+        # Um gerador por item: cada imagem reproduz a mesma seed de uma geração isolada
+        generators = [torch.Generator(device="cpu").manual_seed(item["seed"]) for item in items]
+        prompt_embeds, negative_embeds = self._encode_prompts(pipe, pipe_key, items)
+
+        latents = pipe(
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_embeds,
+            num_inference_steps=steps, 
+            width=width,
+            height=height,
+            generator=generators,
+            output_type="latent",
+            callback=callback_fn, 
+            callback_steps=1
+        ).images
+        return self._decode_latents(pipe, latents)
+
+    @contextmanager
+    def _upcast(self, pipe):
+        """UNet e text encoder em float32 só durante o bloco (a VAE já é fp32)"""
+        original = pipe.unet.dtype
+        pipe.unet.to(dtype=torch.float32)
+        pipe.text_encoder.to(dtype=torch.float32)
+        try:
+            yield pipe
+        finally:
+            pipe.unet.to(dtype=original)
+            pipe.text_encoder.to(dtype=original)
+
+    def _decode_latents(self, pipe, latents):
+        vae = pipe.vae
+        with torch.no_grad():
+            latents = latents.to(dtype=vae.dtype) / vae.config.scaling_factor
+            return vae.decode(latents, return_dict=False)[0]
+
+    def _nan_rows(self, images):
+        """Índices das imagens do lote com NaN/Inf (saída preta da meia precisão)"""
+        bad = ~torch.isfinite(images).flatten(1).all(dim=1)
+        return [i for i, flag in enumerate(bad.tolist()) if flag]
+
+    def _to_pil(self, pipe, images):
+        images = (images / 2 + 0.5).clamp(0, 1)
+        images = images.cpu().permute(0, 2, 3, 1).float().numpy()
+        return pipe.numpy_to_pil(images)
+
+    def generate_batch(self, items, steps=20, width=512, height=512, precision=None):
+        """
+        Gera várias imagens numa única chamada do pipeline (um passe da UNet por passo).
+        Cada item é um dict com prompt, negative_prompt, seed, on_progress e cancel_event.
+        Devolve um resultado por item, na mesma ordem. `encoded` é um Future com os
+        bytes gravados pelo BackgroundWriter; quem chama decide se vira URL ou base64.
+        """
+        for item in items:
+            if item.get("seed") is None:
+                item["seed"] = random.randint(0, 2**32 - 1)
+
+        def is_cancelled(item):
+            event = item.get("cancel_event")
+            return event is not None and event.is_set()
 
         try:
-            self.current_progress = 0
             start_time = time.time()
             
             def callback_fn(step, timestep, latents):
-                self.current_progress = int((step / steps) * 100)
+                # Só aborta o loop se todos os jobs do lote foram cancelados
+                if all(is_cancelled(item) for item in items):
+                    raise RuntimeError("CANCELLED_BY_USER")
+                for item in items:
+                    if item.get("on_progress"):
+                        item["on_progress"](int((step / steps) * 100))
             
-            print(f"Gerando '{prompt}'...")
+            print(f"Gerando lote de {len(items)}: {[item['prompt'] for item in items]}")
             
-            # Limpa cache forçado
-            gc.collect()
-            torch.cuda.empty_cache()
-
-            image = self.pipe(
-                prompt, 
-                num_inference_steps=steps, 
-                callback=callback_fn, 
-                callback_steps=1
-            ).images[0]
-            
-            self._save_to_disk(image, prompt)
+            # Só devolve o cache da CUDA se passou do high-water mark
+            self.memory.maybe_reclaim()
+
+            precision = precision if precision in PRECISIONS else self.precision
+            if self.current_device != "cuda":
+                precision = "fp32"
+            pipe_key = self._pipeline_key(self.current_device, precision)
+            pipe = self.pool.acquire(pipe_key)
+            used_precision = [precision] * len(items)
+
+            with self.memory.track_request() as memory_stats:
+                decoded = self._run_pipeline(pipe, pipe_key, items, steps, width, height, callback_fn)
+
+                # Detector de NaN: refaz em fp32 só os itens afetados desta requisição
+                bad_rows = self._nan_rows(decoded) if precision != "fp32" else []
+                if bad_rows:
+                    print(f"NaN na saída em {precision}, refazendo {len(bad_rows)} imagem(ns) em fp32...")
+                    retry_items = [items[i] for i in bad_rows]
+
+                    def retry_callback(step, timestep, latents):
+                        if all(is_cancelled(item) for item in retry_items):
+                            raise RuntimeError("CANCELLED_BY_USER")
+
+                    # Mesmo pipeline promovido a fp32: pedir outro ao pool despejaria um residente
+                    with self._upcast(pipe):
+                        retried = self._run_pipeline(pipe, f"{pipe_key}+fp32", retry_items, steps, width, height, retry_callback)
+                    decoded = decoded.clone()
+                    for row, i in enumerate(bad_rows):
+                        decoded[i] = retried[row].to(decoded.device, decoded.dtype)
+                        used_precision[i] = "fp32 (fallback)"
+
+                images = self._to_pil(pipe, decoded)
 
             end_time = time.time()
             duration = round(end_time - start_time, 2)
-            self.current_progress = 100
-            
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+
+            results = []
+            for index, (item, image) in enumerate(zip(items, images)):
+                if is_cancelled(item):
+                    results.append({"status": "cancelled"})
+                    continue
+
+                filename, encoded = self._save_to_disk(image, item["prompt"])
+                if item.get("on_progress"):
+                    item["on_progress"](100)
             
-            return {
-                "image": img_str,
-                "duration": duration,
-                "device": self.current_device.upper(),
-                "steps": steps
-            }
+                results.append({
+                    "encoded": encoded,
+                    "filename": filename,
+                    "format": self.writer.extension,
+                    "duration": duration,
+                    "device": self.current_device.upper(),
+                    "steps": steps,
+                    "seed": item["seed"],
+                    "precision": used_precision[index],
+                    "batch_size": len(items),
+                    "memory": memory_stats
+                })
+            return results
             
         except RuntimeError as e:
             if "CANCELLED_BY_USER" in str(e):
                 print("--- Geração abortada com sucesso ---")
-                return {"status": "cancelled"}
+                return [{"status": "cancelled"} for _ in items]
+            if "out of memory" in str(e).lower() and len(items) > 1:
+                # Lote grande demais para a VRAM: refaz item a item
+                print("Sem memória para o lote, gerando individualmente...")
+                self.memory.reclaim("oom")
+                return [self.generate_batch([item], steps, width, height, precision)[0] for item in items]
             print(f"Erro de Runtime: {e}")
-            return {"status": "error", "message": str(e)}
+            return [{"status": "error", "message": str(e)} for _ in items]
             
         except Exception as e:
             print(f"Erro fatal na geração: {e}")
-            return {"status": "error", "message": str(e)}
\ No newline at end of file
+            return [{"status": "error", "message": str(e)} for _ in items]
@@ -0,0 +1,145 @@
+"""
+Catálogo da Galeria
+Índice SQLite das imagens geradas (arquivo, prompt, data de criação).
+Atualizado a cada imagem salva e reconstruído a partir da pasta na
+inicialização, para a rota /gallery não varrer o disco a cada acesso
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+IMAGE_EXTENSIONS = ('.png', '.webp')
+
+
+class GalleryCatalog:
+    """Catálogo persistente com índice por created_at"""
+
+    def __init__(self, db_path, images_dir):
+        self.db_path = db_path
+        self.images_dir = images_dir
+        os.makedirs(self.images_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS images (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    filename TEXT NOT NULL UNIQUE,
+                    prompt TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_images_created ON images (created_at DESC, id DESC)"
+            )
+
+    def add(self, filename, prompt, created_at=None):
+        """Registra (ou atualiza) uma imagem recém-salva"""
+        if created_at is None:
+            created_at = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO images (filename, prompt, created_at) VALUES (?, ?, ?)
+                ON CONFLICT(filename) DO UPDATE SET prompt = excluded.prompt
+                """,
+                (filename, prompt, created_at)
+            )
+
+    def remove(self, filename):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM images WHERE filename = ?", (filename,))
+
+    def rebuild(self):
+        """
+        Sincroniza o catálogo com a pasta: indexa imagens que não estão
+        no banco (ex: geradas antes do catálogo) e remove as que sumiram.
+        """
+        on_disk = {f for f in os.listdir(self.images_dir) if f.endswith(IMAGE_EXTENSIONS)}
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT filename FROM images")}
+
+        missing = []
+        for filename in on_disk - known:
+            path = os.path.join(self.images_dir, filename)
+            try:
+                created_at = os.path.getmtime(path)
+            except OSError:
+                continue
+            missing.append((filename, self._read_prompt(filename), created_at))
+
+        vanished = [(filename,) for filename in known - on_disk]
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO images (filename, prompt, created_at) VALUES (?, ?, ?)",
+                sorted(missing, key=lambda row: row[2])
+            )
+            self._conn.executemany("DELETE FROM images WHERE filename = ?", vanished)
+
+        if missing or vanished:
+            print(f"Catálogo da galeria: +{len(missing)} / -{len(vanished)} imagens")
+
+    def _read_prompt(self, filename):
+        """Prompt do .txt ao lado da imagem; imagens antigas usam o nome do arquivo"""
+        txt_path = os.path.join(self.images_dir, os.path.splitext(filename)[0] + '.txt')
+        if os.path.exists(txt_path):
+            try:
+                with open(txt_path, 'r', encoding='utf-8') as f:
+                    prompt = f.read()
+                if prompt:
+                    return prompt
+            except Exception:
+                pass
+
+        parts = filename.split('_', 2)
+        if len(parts) > 2:
+            return os.path.splitext(parts[2])[0].replace('_', ' ')
+        return filename
+
+    def page(self, after=None, limit=50):
+        """
+        Página por cursor (mais recentes primeiro). `after` é o id do último
+        item da página anterior; devolve (itens, próximo cursor ou None).
+        """
+        with self._lock:
+            if after is None:
+                rows = self._conn.execute(
+                    """
+                    SELECT id, filename, prompt, created_at FROM images
+                    ORDER BY created_at DESC, id DESC LIMIT ?
+                    """,
+                    (limit + 1,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    """
+                    SELECT i.id, i.filename, i.prompt, i.created_at
+                    FROM images i, (SELECT created_at, id FROM images WHERE id = ?) c
+                    WHERE (i.created_at, i.id) < (c.created_at, c.id)
+                    ORDER BY i.created_at DESC, i.id DESC LIMIT ?
+                    """,
+                    (after, limit + 1)
+                ).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = items[-1]['id'] if len(rows) > limit else None
+        return items, next_cursor
+
+    def entries(self):
+        """(filename, prompt, created_at) de todas as imagens"""
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute("SELECT filename, prompt, created_at FROM images")]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
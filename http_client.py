@@ -0,0 +1,135 @@
+"""
+Cliente HTTP Compartilhado
+Uma requests.Session com pools de conexão (keep-alive) por host, para as
+chamadas externas (Pollinations, Ollama) não abrirem TCP+TLS a cada pedido.
+Timeouts separados de conexão e leitura e métricas de conexões reusadas
+"""
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _parse_pool_sizes(spec):
+    """"text.pollinations.ai=8,localhost:11434=2" -> {host: tamanho}"""
+    sizes = {}
+    for item in (spec or '').split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size.isdigit():
+            sizes[host.strip()] = int(size)
+    return sizes
+
+
+class HttpClient:
+    """
+    Sessão única compartilhada entre threads. Cada host ganha o próprio
+    HTTPAdapter (pool urllib3, que é thread-safe) com `pool_maxsize` conexões vivas.
+    """
+
+    def __init__(self, connect_timeout=None, read_timeout=None, pool_maxsize=None, pool_sizes=None):
+        if connect_timeout is None:
+            connect_timeout = float(os.environ.get('HTTP_CONNECT_TIMEOUT', 5))
+        if read_timeout is None:
+            read_timeout = float(os.environ.get('HTTP_READ_TIMEOUT', 60))
+        if pool_maxsize is None:
+            pool_maxsize = int(os.environ.get('HTTP_POOL_MAXSIZE', 10))
+        if pool_sizes is None:
+            pool_sizes = _parse_pool_sizes(os.environ.get('HTTP_POOL_SIZES'))
+
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_maxsize = pool_maxsize
+        self.pool_sizes = pool_sizes
+
+        self.session = requests.Session()
+        self._adapters = {}
+        self._requests = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+
+    def _adapter_for(self, url):
+        """Monta (uma vez) o adapter do host de `url` na sessão"""
+        parts = urlsplit(url)
+        prefix = f"{parts.scheme}://{parts.netloc}/"
+        with self._lock:
+            adapter = self._adapters.get(prefix)
+            if adapter is None:
+                size = self.pool_sizes.get(parts.netloc, self.pool_sizes.get(parts.hostname, self.pool_maxsize))
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                self.session.mount(prefix, adapter)
+                self._adapters[prefix] = adapter
+            return prefix
+
+    def _timeout(self, timeout):
+        """Número = timeout de leitura (conexão usa o padrão); tupla passa direto"""
+        if timeout is None:
+            return (self.connect_timeout, self.read_timeout)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout, timeout), timeout)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        prefix = self._adapter_for(url)
+        with self._lock:
+            self._requests[prefix] = self._requests.get(prefix, 0) + 1
+        try:
+            return self.session.request(method, url, timeout=self._timeout(timeout), **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._errors[prefix] = self._errors.get(prefix, 0) + 1
+            raise
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Por host: pedidos, conexões novas e reusadas (contadores do pool urllib3)"""
+        hosts = {}
+        with self._lock:
+            adapters = dict(self._adapters)
+            requests_made = dict(self._requests)
+            errors = dict(self._errors)
+
+        for prefix, adapter in adapters.items():
+            new_connections = 0
+            pool_requests = 0
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                new_connections += pool.num_connections
+                pool_requests += pool.num_requests
+            hosts[prefix] = {
+                "requests": requests_made.get(prefix, 0),
+                "errors": errors.get(prefix, 0),
+                "new_connections": new_connections,
+                "reused_connections": max(0, pool_requests - new_connections),
+                "pool_maxsize": adapter._pool_maxsize,
+            }
+        return {
+            "connect_timeout": self.connect_timeout,
+            "read_timeout": self.read_timeout,
+            "hosts": hosts,
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente HTTP do processo (criado no primeiro uso)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,253 @@
+"""
+Fila de Jobs de Geração de Imagem
+Um worker dedicado (GPU/CPU) drena uma fila de prioridade limitada,
+assim as rotas Flask respondem na hora com um ID de job
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class QueueFullError(Exception):
+    """A fila está cheia e o job foi recusado (backpressure)"""
+
+
+class Job:
+    """Estado de um job de geração"""
+
+    def __init__(self, params, priority=0):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.priority = priority
+        self.status = "queued"  # queued, running, done, error, cancelled
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Arquivo da imagem pronta (para servir os bytes direto)
+        self.image_path = None
+        # Token de cancelamento lido pelo callback de cada passo da difusão
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ("done", "error", "cancelled")
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.result is not None:
+            data["result"] = self.result
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """
+    Fila de prioridade limitada com um único worker.
+    `handler(job)` roda no thread do worker e devolve o dict de resultado.
+    Prioridade maior sai primeiro; empate respeita a ordem de chegada.
+
+    Micro-batching (opcional): com `batch_handler(jobs)` e `batch_key(params)`,
+    o worker espera até `batch_window` segundos por jobs compatíveis (mesma
+    chave) e roda até `max_batch_size` deles juntos. Chave None = não agrupa.
+    """
+
+    def __init__(self, handler, max_size=16, max_finished=200,
+                 batch_handler=None, batch_key=None, max_batch_size=4, batch_window=0.05):
+        self.handler = handler
+        self.max_size = max_size
+        self.max_finished = max_finished
+        self.batch_handler = batch_handler
+        self.batch_key = batch_key
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_window = batch_window
+
+        self._heap = []
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._sequence = itertools.count()
+        self._current = []
+
+        self._worker = threading.Thread(target=self._run, name="image-job-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, params, priority=0):
+        """Enfileira um job. Levanta QueueFullError se a fila estiver cheia."""
+        job = Job(params, priority)
+        with self._lock:
+            if len(self._heap) >= self.max_size:
+                raise QueueFullError(f"Fila cheia ({self.max_size} jobs pendentes)")
+            heapq.heappush(self._heap, (-priority, next(self._sequence), job))
+            self._jobs[job.id] = job
+            self._not_empty.notify()
+        return job
+
+    def add_completed(self, params, result):
+        """Registra um job já resolvido (ex: resultado vindo do cache), sem passar pelo worker"""
+        job = Job(params)
+        job.started_at = job.created_at
+        self._finish(job, result)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._prune()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def current(self):
+        """Job em execução no worker (ou None)"""
+        running = self._current
+        return running[0] if running else None
+
+    def cancel(self, job_id):
+        """
+        Cancela um job. Se ainda estiver na fila, nem chega a rodar;
+        se estiver rodando, o passo atual da difusão interrompe o loop.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+
+            job.cancel()
+            # Ainda na fila: sai do heap na hora para não ocupar vaga (nem contar como pendente)
+            kept = [entry for entry in self._heap if entry[2] is not job]
+            if len(kept) != len(self._heap):
+                heapq.heapify(kept)
+                self._heap = kept
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            pending = len(self._heap)
+        return {
+            "pending": pending,
+            "max_size": self.max_size,
+            "running": statuses.count("running"),
+            "tracked": len(statuses),
+            "max_batch_size": self.max_batch_size,
+            "batch_window": self.batch_window,
+        }
+
+    def _run(self):
+        while True:
+            jobs = self._next_batch()
+            if not jobs:
+                continue
+            self._current = jobs
+            try:
+                self._execute(jobs)
+            finally:
+                self._current = []
+
+    def _key_for(self, job):
+        if self.batch_handler is None or self.batch_key is None:
+            return None
+        return self.batch_key(job.params)
+
+    def _next_batch(self):
+        """Tira o próximo job e, se possível, junta os compatíveis na janela de batching"""
+        with self._not_empty:
+            while not self._heap:
+                self._not_empty.wait()
+            _, _, first = heapq.heappop(self._heap)
+            if first.cancelled:
+                return []
+
+            key = self._key_for(first)
+            if key is None or self.max_batch_size == 1:
+                return [first]
+
+            batch = [first]
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                self._take_compatible(key, batch)
+                remaining = deadline - time.time()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+            return batch
+
+    def _take_compatible(self, key, batch):
+        """Move da fila para o lote os jobs com a mesma chave (chamado com o lock)"""
+        kept = []
+        for entry in sorted(self._heap):
+            job = entry[2]
+            if job.cancelled:
+                continue
+            if len(batch) < self.max_batch_size and self._key_for(job) == key:
+                batch.append(job)
+            else:
+                kept.append(entry)
+        heapq.heapify(kept)
+        self._heap = kept
+
+    def _execute(self, jobs):
+        for job in jobs:
+            job.status = "running"
+            job.started_at = time.time()
+
+        try:
+            if len(jobs) > 1:
+                results = self.batch_handler(jobs)
+            else:
+                results = [self.handler(jobs[0])]
+        except Exception as e:
+            print(f"Erro nos jobs {[job.id for job in jobs]}: {e}")
+            results = [{"status": "error", "message": str(e)} for _ in jobs]
+
+        for job, result in zip(jobs, results):
+            self._finish(job, result)
+        self._prune()
+
+    def _finish(self, job, result):
+        status = (result or {}).get("status")
+        if job.cancelled or status == "cancelled":
+            job.status = "cancelled"
+        elif result is None:
+            job.status = "error"
+            job.error = "Geração não retornou resultado"
+        elif status == "error":
+            job.status = "error"
+            job.error = result.get("message")
+        else:
+            job.status = "done"
+            job.progress = 100
+            job.result = result
+
+        job.finished_at = time.time()
+
+    def _prune(self):
+        """Esquece os jobs finalizados mais antigos além de max_finished"""
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+            for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+                del self._jobs[job_id]
@@ -0,0 +1,106 @@
+"""
+Política de Memória da GPU
+Em vez de limpar o cache a cada imagem, acompanha as estatísticas do
+alocador CUDA e só recupera memória quando passa do limite (high-water mark)
+ou quando o modelo é trocado
+"""
+
+import gc
+import os
+import time
+from contextlib import contextmanager
+
+import torch
+
+MB = 1024 * 1024
+
+
+class MemoryPolicy:
+    """
+    Decide quando chamar gc.collect() + torch.cuda.empty_cache().
+    O pool do caching allocator fica aquecido entre gerações; só é
+    devolvido ao driver quando a memória reservada passa de `high_water`
+    (fração da VRAM total) ou quando um modelo sai da memória.
+    """
+
+    def __init__(self, high_water=None, device_index=0):
+        if high_water is None:
+            high_water = float(os.environ.get('GPU_MEMORY_HIGH_WATER', 0.85))
+        self.high_water = max(0.1, min(1.0, high_water))
+        self.device_index = device_index
+        self.reclaim_count = 0
+        self.last_reclaim = None
+
+    @property
+    def enabled(self):
+        return torch.cuda.is_available()
+
+    def total_memory(self):
+        return torch.cuda.get_device_properties(self.device_index).total_memory
+
+    def usage(self):
+        """Fração da VRAM reservada pelo caching allocator"""
+        if not self.enabled:
+            return 0.0
+        return torch.cuda.memory_reserved(self.device_index) / self.total_memory()
+
+    def should_reclaim(self):
+        return self.enabled and self.usage() >= self.high_water
+
+    def reclaim(self, reason):
+        """Libera objetos Python e devolve o cache da CUDA ao driver"""
+        gc.collect()
+        if self.enabled:
+            torch.cuda.empty_cache()
+        self.reclaim_count += 1
+        self.last_reclaim = {"reason": reason, "time": time.time()}
+        print(f"--- Memória recuperada ({reason}) ---")
+
+    def maybe_reclaim(self):
+        """Recupera só se a memória reservada passou do high-water mark"""
+        if self.should_reclaim():
+            self.reclaim("high_water")
+            return True
+        return False
+
+    def on_model_swap(self):
+        self.reclaim("model_swap")
+
+    @contextmanager
+    def track_request(self):
+        """
+        Mede o uso de VRAM de uma geração. O dict entregue é preenchido
+        ao sair do bloco (valores em MB).
+        """
+        stats = {}
+        if not self.enabled:
+            yield stats
+            return
+
+        torch.cuda.reset_peak_memory_stats(self.device_index)
+        before = torch.cuda.memory_allocated(self.device_index)
+        try:
+            yield stats
+        finally:
+            stats.update({
+                "allocated_before_mb": round(before / MB, 1),
+                "allocated_after_mb": round(torch.cuda.memory_allocated(self.device_index) / MB, 1),
+                "peak_allocated_mb": round(torch.cuda.max_memory_allocated(self.device_index) / MB, 1),
+                "reserved_mb": round(torch.cuda.memory_reserved(self.device_index) / MB, 1),
+            })
+
+    def stats(self):
+        data = {
+            "cuda": self.enabled,
+            "high_water": self.high_water,
+            "reclaim_count": self.reclaim_count,
+            "last_reclaim": self.last_reclaim,
+        }
+        if self.enabled:
+            data.update({
+                "total_mb": round(self.total_memory() / MB, 1),
+                "allocated_mb": round(torch.cuda.memory_allocated(self.device_index) / MB, 1),
+                "reserved_mb": round(torch.cuda.memory_reserved(self.device_index) / MB, 1),
+                "usage": round(self.usage(), 3),
+            })
+        return data
@@ -0,0 +1,144 @@
+"""
+Cache de Resultados de Geração
+Cache em disco endereçado por conteúdo: a chave é o hash de todos os
+parâmetros da geração e o valor é o PNG + metadados. Pedidos idênticos
+(mesma seed) voltam em milissegundos sem tocar na GPU
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+IMAGE_FORMATS = ('png', 'webp')
+
+
+class ResultCache:
+    """
+    Guarda `<hash>.<formato>` (png/webp) e `<hash>.json` em `cache_dir`, limitado a `max_bytes`.
+    O mtime do arquivo marca o último uso; a evicção remove os mais antigos (LRU).
+    """
+
+    def __init__(self, cache_dir, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('RESULT_CACHE_MB', 512)) * 1024 * 1024
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key_for(params):
+        """Hash estável dos parâmetros (ordem das chaves não importa)"""
+        payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key, image_format='png'):
+        return self._paths(key, image_format)[0]
+
+    def _paths(self, key, image_format='png'):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.{image_format}", base + '.json'
+
+    def get(self, key):
+        """Devolve (image_bytes, metadata) ou None"""
+        _, meta_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            image_path = self.path_for(key, metadata.get('format', 'png'))
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+            os.utime(image_path)  # marca como usado recentemente
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return image_bytes, metadata
+
+    def put(self, key, image_bytes, metadata):
+        image_format = metadata.get('format', 'png')
+        image_path, meta_path = self._paths(key, image_format)
+        # Com o lock: duas gravações da mesma chave não contam o tamanho antigo duas vezes
+        with self._lock:
+            replaced = self._size(image_path)
+            try:
+                # Escrita atômica: um leitor nunca vê uma imagem pela metade
+                self._write_atomic(image_path, image_bytes)
+                self._write_atomic(meta_path, json.dumps(metadata, ensure_ascii=False).encode('utf-8'))
+            except OSError as e:
+                print(f"Erro ao salvar no cache de resultados: {e}")
+                return
+
+            # Mesma chave regravada em outro formato: a imagem antiga deixa de valer
+            for other in IMAGE_FORMATS:
+                stale = self.path_for(key, other)
+                if other != image_format and os.path.exists(stale):
+                    replaced += self._size(stale)
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+
+            self._total_bytes += len(image_bytes) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    @staticmethod
+    def _size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _entries(self):
+        """(mtime, nome do arquivo, tamanho) de cada imagem do cache"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(tuple(f'.{fmt}' for fmt in IMAGE_FORMATS)):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove os menos usados até ficar abaixo de 90% do limite (chamado com o lock)"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        self._total_bytes = sum(size for _, _, size in entries)
+        for _, name, size in entries:
+            if self._total_bytes <= target:
+                break
+            key = os.path.splitext(name)[0]
+            for path in (os.path.join(self.cache_dir, name), self._paths(key)[1]):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes -= size
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,135 @@
+"""
+Índice de Busca Textual
+Índice invertido compartilhado (SQLite FTS5) sobre prompts de imagens,
+textos das falas da IA e prompts de áudio. Busca ranqueada (bm25),
+por prefixo e sem diferenciar acentos ("sao" encontra "São")
+"""
+
+import re
+import sqlite3
+import threading
+import time
+
+KINDS = ('image', 'speech', 'audio')
+
+
+class SearchIndex:
+    """
+    Tabela `docs` (kind, ref, text) com um índice FTS5 de conteúdo externo
+    mantido por triggers. `ref` identifica o item dentro do tipo (nome do arquivo).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    ref TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    UNIQUE (kind, ref)
+                );
+
+                CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                    text,
+                    content='docs',
+                    content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+
+                CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+                    INSERT INTO docs_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+                    INSERT INTO docs_fts(docs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                END;
+
+                CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF text ON docs BEGIN
+                    INSERT INTO docs_fts(docs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+                    INSERT INTO docs_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+            """)
+
+    def add(self, kind, ref, text, created_at=None):
+        """Indexa (ou atualiza) um item"""
+        if not text:
+            return
+        if created_at is None:
+            created_at = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO docs (kind, ref, text, created_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(kind, ref) DO UPDATE SET text = excluded.text
+                """,
+                (kind, ref, text, created_at)
+            )
+
+    def remove(self, kind, ref):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM docs WHERE kind = ? AND ref = ?", (kind, ref))
+
+    def sync(self, kind, docs):
+        """
+        Alinha o índice de um tipo com a fonte de verdade (na inicialização).
+        `docs` é uma lista de (ref, text, created_at).
+        """
+        refs = {doc[0] for doc in docs}
+        with self._lock, self._conn:
+            known = {row[0] for row in self._conn.execute("SELECT ref FROM docs WHERE kind = ?", (kind,))}
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO docs (kind, ref, text, created_at) VALUES (?, ?, ?, ?)",
+                [(kind, ref, text, created_at) for ref, text, created_at in docs if ref not in known and text]
+            )
+            self._conn.executemany(
+                "DELETE FROM docs WHERE kind = ? AND ref = ?",
+                [(kind, ref) for ref in known - refs]
+            )
+
+    def _match_expression(self, query):
+        """Converte texto livre em termos FTS5 entre aspas, com prefixo (AND implícito)"""
+        terms = re.findall(r'\w+', query, flags=re.UNICODE)
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def search(self, query, kind=None, limit=20, offset=0):
+        """Busca ranqueada; devolve (itens, há_mais)"""
+        expression = self._match_expression(query)
+        if not expression:
+            return [], False
+
+        sql = """
+            SELECT d.kind, d.ref, d.text, d.created_at,
+                   snippet(docs_fts, 0, '[', ']', '…', 12) AS snippet
+            FROM docs_fts
+            JOIN docs d ON d.id = docs_fts.rowid
+            WHERE docs_fts MATCH ?
+        """
+        params = [expression]
+        if kind:
+            sql += " AND d.kind = ?"
+            params.append(kind)
+        sql += " ORDER BY rank LIMIT ? OFFSET ?"
+        params.extend([limit + 1, offset])
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        return items, len(rows) > limit
+
+    def count(self, kind=None):
+        with self._lock:
+            if kind:
+                return self._conn.execute("SELECT COUNT(*) FROM docs WHERE kind = ?", (kind,)).fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
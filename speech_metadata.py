@@ -0,0 +1,160 @@
+"""
+Metadados das Falas da IA
+Log JSONL só de acréscimo (uma linha por fala criada/apagada) no lugar de
+reescrever o speeches_metadata.json inteiro a cada fala. Compactado de
+tempos em tempos com escrita atômica (arquivo temporário + os.replace)
+"""
+
+import json
+import os
+import threading
+
+
+class SpeechMetadataStore:
+    """
+    Dicionário filename -> metadados persistido em `log_path`.
+    Cada escrita é uma linha acrescentada ao log (custo constante); o log
+    é reescrito só quando as linhas obsoletas passam de `compact_ratio`.
+    """
+
+    def __init__(self, log_path, legacy_path=None, compact_ratio=2.0, compact_min_lines=200, fsync=None):
+        if fsync is None:
+            fsync = os.environ.get('SPEECH_METADATA_FSYNC', '0') == '1'
+        self.log_path = log_path
+        self.legacy_path = legacy_path
+        self.compact_ratio = compact_ratio
+        self.compact_min_lines = compact_min_lines
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._data = {}
+        self._log_lines = 0
+
+        self._load()
+        self._file = open(self.log_path, 'a', encoding='utf-8')
+        self._terminate_partial_line()
+
+    def _load(self):
+        if os.path.exists(self.log_path):
+            self._replay()
+        elif self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate_legacy()
+
+    def _replay(self):
+        """Reaplica o log; uma última linha truncada (queda no meio da escrita) é ignorada"""
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Linha inválida ignorada em {self.log_path}")
+                    continue
+                self._log_lines += 1
+                filename = record.get('filename')
+                if record.get('op') == 'del':
+                    self._data.pop(filename, None)
+                elif filename is not None:
+                    self._data[filename] = record.get('meta', {})
+
+    def _terminate_partial_line(self):
+        """Fecha uma linha truncada no fim do log para o próximo registro não colar nela"""
+        with open(self.log_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                self._file.write('\n')
+                self._file.flush()
+
+    def _migrate_legacy(self):
+        """
+        Converte o speeches_metadata.json antigo para o log (uma vez). O arquivo
+        antigo fica onde está (é versionado); com o log existindo, não é mais lido.
+        """
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                self._data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler metadados antigos ({self.legacy_path}): {e}")
+            self._data = {}
+        self._rewrite()
+        print(f"Metadados de falas migrados para {self.log_path} ({len(self._data)} falas)")
+
+    def _rewrite(self):
+        """Grava o estado atual num log novo e troca atomicamente (chamado com o lock ou na carga)"""
+        tmp_path = self.log_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for filename, meta in self._data.items():
+                f.write(self._encode('put', filename, meta))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        self._log_lines = len(self._data)
+
+    @staticmethod
+    def _encode(op, filename, meta=None):
+        record = {'op': op, 'filename': filename}
+        if meta is not None:
+            record['meta'] = meta
+        return json.dumps(record, ensure_ascii=False) + '\n'
+
+    def _append(self, line):
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._log_lines += 1
+        if self._log_lines >= self.compact_min_lines and self._log_lines > self.compact_ratio * max(1, len(self._data)):
+            self._compact()
+
+    def _compact(self):
+        self._file.close()
+        try:
+            self._rewrite()
+        finally:
+            self._file = open(self.log_path, 'a', encoding='utf-8')
+
+    def put(self, filename, meta):
+        with self._lock:
+            self._data[filename] = meta
+            self._append(self._encode('put', filename, meta))
+
+    def delete(self, filename):
+        with self._lock:
+            if self._data.pop(filename, None) is None:
+                return False
+            self._append(self._encode('del', filename))
+            return True
+
+    def compact(self):
+        with self._lock:
+            self._compact()
+
+    def get(self, filename, default=None):
+        with self._lock:
+            return self._data.get(filename, default)
+
+    def items(self):
+        """Cópia dos itens (seguro para iterar enquanto outros threads gravam)"""
+        with self._lock:
+            return list(self._data.items())
+
+    def __contains__(self, filename):
+        with self._lock:
+            return filename in self._data
+
+    def __getitem__(self, filename):
+        with self._lock:
+            return self._data[filename]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -28,6 +28,8 @@ class AIChatSystem {
         this.isProcessing = false;
         this.isPlayingAudio = false; // NOVO: controlar áudio ativo
         this.currentAudio = null; // Rastrear áudio atualmente tocando
+        this.speechQueue = []; // Trechos do TTS em streaming aguardando reprodução
+        this.speechStream = null; // AbortController do TTS em streaming
         this.conversationHistory = [];
         this.pendingController = null;
         this.loadingTimeout = null;
@@ -270,39 +272,72 @@ class AIChatSystem {
         this.pendingController = controller;
         
         try {
-            // Enviar para backend
-            const response = await axios.post('/api/ai-chat', {
-                message: message,
-                history: this.conversationHistory
-            }, {
+            // Enviar para backend: o texto chega em pedaços (SSE)
+            const res = await fetch('/api/ai-chat/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    message: message,
+                    history: this.conversationHistory,
+                    audio_mode: 'stream'
+                }),
                 signal: controller.signal
             });
+            if (!res.ok) {
+                throw new Error(`HTTP ${res.status}`);
+            }
+            
+            let messageEl = null;
+            let partial = '';
+            let result = null;
+            
+            await this.readEventStream(res, (event, payload) => {
+                if (event === 'token') {
+                    partial += payload.text;
+                    if (!messageEl) {
+                        // Primeiro pedaço: trocar o indicador de carregamento pela mensagem
+                        this.clearLoadingIndicator();
+                        this.waveLabel.textContent = '💬 Respondendo...';
+                        messageEl = this.addMessageToChat('ai', partial);
+                    } else {
+                        this.updateMessageText(messageEl, partial);
+                    }
+                } else if (event === 'done') {
+                    result = payload;
+                } else if (event === 'error') {
+                    throw new Error(payload.error);
+                }
+            });
+            
+            if (!result) {
+                throw new Error('Resposta incompleta');
+            }
             
-            const aiMessage = response.data.response;
-            const newState = response.data.ai_state;
+            const aiMessage = result.response;
             
             // Atualizar estado da IA
-            if (newState) {
-                this.updateAIState(newState);
+            if (result.ai_state) {
+                this.updateAIState(result.ai_state);
             }
             
-            // Adicionar resposta ao histórico
-            this.addMessageToChat('ai', aiMessage);
+            // Texto final (sem espaços sobrando do streaming)
+            if (messageEl) {
+                this.updateMessageText(messageEl, aiMessage);
+            } else {
+                this.addMessageToChat('ai', aiMessage);
+            }
             this.conversationHistory.push({ role: 'user', content: message });
             this.conversationHistory.push({ role: 'assistant', content: aiMessage });
             
-            // Gerar áudio da resposta
-            if (response.data.audio_url) {
-                this.playAudioResponse(response.data.audio_url);
-            }
-            
-            // Salvar áudio da fala da IA
-            if (response.data.audio_saved) {
-                this.updateAudioGallery();
+            // Áudio da resposta: frase a frase ou gerado em segundo plano
+            if (result.audio_status === 'stream') {
+                this.streamSpeech(aiMessage);
+            } else if (result.audio_job_id) {
+                this.waitForSpeech(result.audio_job_id);
             }
             
         } catch (error) {
-            const isCanceled = error && (error.code === 'ERR_CANCELED' || error.message === 'canceled');
+            const isCanceled = error && (error.name === 'AbortError' || error.code === 'ERR_CANCELED' || error.message === 'canceled');
             if (isCanceled) {
                 if (this.cancelledByUser) {
                     this.addMessageToChat('ai', '⚠️ Resposta cancelada a pedido.');
@@ -324,13 +359,121 @@ class AIChatSystem {
         }
     }
 
+    async streamSpeech(text) {
+        /**
+         * TTS em streaming (SSE): toca cada frase assim que fica pronta
+         */
+        const controller = new AbortController();
+        this.speechStream = controller;
+        this.speechQueue = [];
+        
+        try {
+            const res = await fetch('/api/ai-speech/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ text }),
+                signal: controller.signal
+            });
+            if (!res.ok) {
+                throw new Error(`HTTP ${res.status}`);
+            }
+            
+            await this.readEventStream(res, (event, payload) => this.handleSpeechEvent(event, payload));
+        } catch (error) {
+            if (error.name !== 'AbortError') {
+                console.error('Erro no áudio em streaming:', error);
+            }
+        } finally {
+            if (this.speechStream === controller) {
+                this.speechStream = null;
+            }
+        }
+    }
+
+    async readEventStream(res, onEvent) {
+        /**
+         * Lê uma resposta Server-Sent Events (fetch) e chama onEvent(evento, dados)
+         */
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) {
+                    onEvent(event, JSON.parse(data));
+                }
+            }
+        }
+    }
+
+    handleSpeechEvent(event, payload) {
+        if (event === 'segment') {
+            this.speechQueue.push(payload.url);
+            if (!this.currentAudio) {
+                this.playNextSegment();
+            }
+        } else if (event === 'done') {
+            this.updateAudioGallery();
+        } else if (event === 'error') {
+            console.error('Erro ao gerar áudio:', payload.error);
+        }
+    }
+
+    playNextSegment() {
+        const url = this.speechQueue.shift();
+        if (url) {
+            this.playAudioResponse(url, () => this.playNextSegment());
+        }
+    }
+
+    async waitForSpeech(jobId) {
+        /**
+         * Consulta o áudio gerado em segundo plano até ficar pronto
+         */
+        for (let attempt = 0; attempt < 120; attempt++) {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            try {
+                const res = await axios.get(`/api/speech-jobs/${jobId}`);
+                if (res.data.status === 'done') {
+                    if (res.data.audio_url) {
+                        this.playAudioResponse(res.data.audio_url);
+                        this.updateAudioGallery();
+                    }
+                    return;
+                }
+                if (res.data.status === 'error') {
+                    console.error('Erro ao gerar áudio:', res.data.error);
+                    return;
+                }
+            } catch (error) {
+                console.error('Erro ao consultar áudio:', error);
+                return;
+            }
+        }
+    }
+
     async checkAIIdle() {
         /**
          * Verifica periodicamente se a IA quer falar sozinha
          * NÃO fala enquanto há áudio tocando
          */
-        // Pular verificação se áudio está tocando
-        if (this.isPlayingAudio) {
+        // Pular verificação se áudio está tocando (ou chegando em streaming)
+        if (this.isPlayingAudio || this.speechStream) {
             return;
         }
         
@@ -404,6 +547,12 @@ class AIChatSystem {
         
         this.chatHistory.appendChild(messageEl);
         this.chatHistory.scrollTop = this.chatHistory.scrollHeight;
+        return messageEl;
+    }
+
+    updateMessageText(messageEl, content) {
+        messageEl.querySelector('.message-text').innerHTML = this.formatMessageText(content);
+        this.chatHistory.scrollTop = this.chatHistory.scrollHeight;
     }
 
     formatMessageText(text) {
@@ -560,7 +709,7 @@ class AIChatSystem {
         }
     }
 
-    playAudioResponse(audioUrl) {
+    playAudioResponse(audioUrl, onEnded = null) {
         /**
          * Toca o áudio da resposta da IA
          * Evita fala simultânea: para qualquer áudio anterior
@@ -591,6 +740,7 @@ class AIChatSystem {
             window.waveVisualizer?.stopAnimation();
             this.waveContainer.classList.remove('ai-speaking');
             this.updateSendButton();
+            if (onEnded) onEnded();
         };
         
         audio.onerror = () => {
@@ -598,6 +748,7 @@ class AIChatSystem {
             this.isPlayingAudio = false;
             this.currentAudio = null;
             this.updateSendButton();
+            if (onEnded) onEnded();
         };
         
         audio.play().catch(e => {
@@ -735,6 +886,13 @@ class AIChatSystem {
     }
 
     stopAudioPlayback(userInitiated = false) {
+        // Descartar os trechos ainda não tocados do TTS em streaming
+        this.speechQueue = [];
+        if (this.speechStream) {
+            this.speechStream.abort();
+            this.speechStream = null;
+        }
+
         if (!this.isPlayingAudio && !this.currentAudio) {
             return;
         }
@@ -1,4 +1,4 @@
-let intervalId;
+let currentJobId = null;
 let isSpinning = false;
 
 // --- SISTEMA DE SOM ---
@@ -189,30 +189,37 @@ async function startGeneration() {
     const askModal = new bootstrap.Modal(document.getElementById('askGameModal'));
     askModal.show();
 
-    intervalId = setInterval(checkProgress, 1000);
-
     try {
         const response = await fetch('/generate', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ prompt: prompt, device: device })
+            body: JSON.stringify({ prompt: prompt, device: device, response_mode: 'url' })
         });
 
-        const data = await response.json();
-        clearInterval(intervalId);
+        if (response.status === 429) {
+            playSound('error');
+            alert("Fila de geração cheia. Tente novamente em alguns segundos.");
+            progressContainer.style.display = 'none';
+            return;
+        }
+
+        const job = await response.json();
+        currentJobId = job.job_id;
+        const data = await waitForJob(job.job_id);
 
         if (data.status === "cancelled") {
             // Se foi cancelado
             progressContainer.style.display = 'none';
             alert("Geração cancelada!");
-        } else if (data.image) {
+        } else if (data.status === "done" && data.result && data.result.url) {
+            const result = data.result;
             playSound('success'); // Som de sucesso
             // Se deu sucesso
             updateProgress(100);
-            document.getElementById('resultImg').src = `data:image/png;base64,${data.image}`;
-            document.getElementById('statTime').innerText = data.duration + " segundos";
-            document.getElementById('statDevice').innerText = data.device;
-            document.getElementById('statSteps').innerText = data.steps;
+            document.getElementById('resultImg').src = result.url;
+            document.getElementById('statTime').innerText = result.duration + " segundos";
+            document.getElementById('statDevice').innerText = result.device;
+            document.getElementById('statSteps').innerText = result.steps;
 
             setTimeout(() => {
                 progressContainer.style.display = 'none';
@@ -230,7 +237,21 @@ async function startGeneration() {
         progressContainer.style.display = 'none';
     } finally {
         btn.disabled = false;
-        clearInterval(intervalId);
+        currentJobId = null;
+    }
+}
+
+// Consulta o job até ele terminar, atualizando a barra de progresso
+async function waitForJob(jobId) {
+    while (true) {
+        const res = await fetch(`/jobs/${jobId}`);
+        const data = await res.json();
+        if (!res.ok) return { status: 'error' };
+
+        updateProgress(data.progress);
+        if (['done', 'error', 'cancelled'].includes(data.status)) return data;
+
+        await new Promise(resolve => setTimeout(resolve, 1000));
     }
 }
 
@@ -240,24 +261,19 @@ async function cancelGeneration() {
     btn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Parando...';
 
     try {
-        await fetch('/cancel', { method: 'POST' });
-        // O loop de verificação de progresso (checkProgress) vai continuar rodando
-        // até que a requisição principal (/generate) retorne "cancelled"
+        if (!currentJobId) return;
+        await fetch('/cancel', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ job_id: currentJobId })
+        });
+        // O loop de verificação do job (waitForJob) vai continuar rodando
+        // até que o job retorne "cancelled"
     } catch (error) {
         console.error("Erro ao cancelar:", error);
     }
 }
 
-async function checkProgress() {
-    try {
-        const res = await fetch('/progress');
-        const data = await res.json();
-        updateProgress(data.progress);
-    } catch (e) {
-        console.log("Erro ao checar progresso", e);
-    }
-}
-
 function updateProgress(val) {
     const bar = document.getElementById('progressBar');
     const text = document.getElementById('progressText');
@@ -266,17 +282,26 @@ function updateProgress(val) {
 }
 
 // --- GALERIA ---
-async function loadGallery() {
+let galleryCursor = null;
+
+async function loadGallery(append = false) {
     const grid = document.getElementById('galleryGrid');
-    grid.innerHTML = '<div class="text-center w-100 mt-5"><i class="fas fa-spinner fa-spin"></i> Carregando...</div>';
+    if (!append) {
+        galleryCursor = null;
+        grid.innerHTML = '<div class="text-center w-100 mt-5"><i class="fas fa-spinner fa-spin"></i> Carregando...</div>';
+    }
 
     try {
-        const response = await fetch('/gallery');
-        const images = await response.json();
+        const url = galleryCursor ? `/gallery?after=${galleryCursor}` : '/gallery';
+        const response = await fetch(url);
+        const page = await response.json();
+        const images = page.items;
 
-        grid.innerHTML = '';
+        if (!append) grid.innerHTML = '';
+        const moreBtn = document.getElementById('galleryMoreBtn');
+        if (moreBtn) moreBtn.remove();
 
-        if (images.length === 0) {
+        if (!append && images.length === 0) {
             grid.innerHTML = '<div class="text-center w-100 mt-5 text-muted">Nenhuma imagem gerada ainda.</div>';
             return;
         }
@@ -287,12 +312,23 @@ async function loadGallery() {
             item.onclick = () => openImageModal(img.filename, img.prompt);
 
             item.innerHTML = `
-                <img src="/images/${img.filename}" loading="lazy" alt="${img.prompt}">
+                <img src="${img.thumb_url}" loading="lazy" alt="${img.prompt}">
                 <div class="gallery-overlay">${img.prompt}</div>
             `;
             grid.appendChild(item);
         });
 
+        // Próxima página sob demanda (cursor)
+        galleryCursor = page.next_cursor;
+        if (galleryCursor) {
+            const more = document.createElement('button');
+            more.id = 'galleryMoreBtn';
+            more.className = 'btn btn-outline-light w-100 mt-3';
+            more.innerHTML = '<i class="fas fa-chevron-down"></i> Carregar mais';
+            more.onclick = () => loadGallery(true);
+            grid.appendChild(more);
+        }
+
     } catch (error) {
         console.error("Erro ao carregar galeria:", error);
         grid.innerHTML = '<div class="text-center w-100 mt-5 text-danger">Erro ao carregar galeria.</div>';
@@ -404,7 +440,7 @@ async function sendChat() {
         // Pega configurações
         const systemPrompt = localStorage.getItem('sudo_system_prompt');
 
-        const response = await fetch('/chat', {
+        const response = await fetch('/chat/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({
@@ -413,22 +449,47 @@ async function sendChat() {
                 system_instruction: systemPrompt // Envia a personalidade
             })
         });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+        // 3. Resposta da IA chega em pedaços (SSE)
+        let messageDiv = null;
+        let partial = '';
+        let finalText = null;
+
+        await readEventStream(response, (event, payload) => {
+            if (event === 'token') {
+                partial += payload.text;
+                if (!messageDiv) {
+                    // Primeiro pedaço: troca o loading pela mensagem
+                    const loadingEl = document.getElementById(loadingId);
+                    if (loadingEl) loadingEl.remove();
+                    messageDiv = appendMessage('ai', partial);
+                } else {
+                    renderMessage(messageDiv, partial);
+                }
+            } else if (event === 'done') {
+                finalText = payload.response;
+            } else if (event === 'error') {
+                throw new Error(payload.error);
+            }
+        });
 
-        const data = await response.json();
-
-        // Remove loading
         const loadingEl = document.getElementById(loadingId);
         if (loadingEl) loadingEl.remove();
 
-        // 3. Adiciona resposta da IA
-        appendMessage('ai', data.response);
+        const reply = finalText ?? partial;
+        if (messageDiv) {
+            renderMessage(messageDiv, reply);
+        } else {
+            appendMessage('ai', reply);
+        }
         playSound('chat'); // Som de mensagem recebida
 
         // Adiciona ao histórico
-        chatHistory.push({ role: 'assistant', content: data.response });
+        chatHistory.push({ role: 'assistant', content: reply });
 
         // 4. Toca o áudio (TTS) se configurado
-        playResponseAudio(data.response);
+        playResponseAudio(reply);
 
     } catch (error) {
         const loadingEl = document.getElementById(loadingId);
@@ -447,15 +508,49 @@ function appendMessage(role, text) {
     const div = document.createElement('div');
     div.className = `chat-message ${role}`;
 
+    renderMessage(div, text);
+
+    container.appendChild(div);
+    container.scrollTop = container.scrollHeight;
+    return div;
+}
+
+function renderMessage(div, text) {
     // Renderiza Markdown se disponível, senão usa texto simples
     if (typeof marked !== 'undefined') {
         div.innerHTML = marked.parse(text);
     } else {
         div.innerHTML = text.replace(/\n/g, '<br>');
     }
+    const container = div.parentElement;
+    if (container) container.scrollTop = container.scrollHeight;
+}
 
-    container.appendChild(div);
-    container.scrollTop = container.scrollHeight;
+async function readEventStream(response, onEvent) {
+    // Lê uma resposta Server-Sent Events (fetch) e chama onEvent(evento, dados)
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
 }
 
 function appendLoading() {
@@ -0,0 +1,77 @@
+from chat_cache import ChatResponseCache, normalize_text
+
+
+def context(**overrides):
+    base = {
+        "system_instruction": "Você é um assistente.",
+        "history": [],
+        "provider": "ollama",
+        "model": "llama3",
+        "temperature": 0.2,
+    }
+    base.update(overrides)
+    return base
+
+
+def test_normalize_text_ignores_case_accents_and_punctuation():
+    assert normalize_text("  Olá,   Mundo!! ") == "ola, mundo"
+    assert normalize_text(None) == ""
+
+
+def test_hit_on_normalized_message():
+    cache = ChatResponseCache(max_entries=8, ttl=60, max_temperature=0.5)
+    cache.put("Obrigado!", "De nada", **context())
+
+    assert cache.get("obrigado", **context()) == "De nada"
+    assert cache.stats()["hits"] == 1
+
+
+def test_context_changes_miss():
+    cache = ChatResponseCache(max_entries=8, ttl=60, max_temperature=0.5)
+    cache.put("oi", "Olá!", **context())
+
+    assert cache.get("oi", **context(provider="pollinations")) is None
+    assert cache.get("oi", **context(history=[{"role": "user", "content": "tchau"}])) is None
+    assert cache.get("oi", **context(temperature=0.45)) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_high_temperature_is_skipped():
+    cache = ChatResponseCache(max_entries=8, ttl=60, max_temperature=0.5)
+    cache.put("oi", "Olá!", **context(temperature=0.9))
+
+    assert cache.get("oi", **context(temperature=0.9)) is None
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["skipped"] == 1
+
+
+def test_expired_entries_miss():
+    cache = ChatResponseCache(max_entries=8, ttl=-1, max_temperature=0.5)
+    cache.put("oi", "Olá!", **context())
+
+    assert cache.get("oi", **context()) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = ChatResponseCache(max_entries=2, ttl=60, max_temperature=0.5)
+    cache.put("a", "A", **context())
+    cache.put("b", "B", **context())
+    cache.get("a", **context())
+    cache.put("c", "C", **context())
+
+    assert cache.get("b", **context()) is None
+    assert cache.get("a", **context()) == "A"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_semantic_hit_within_same_context():
+    vectors = {"bom dia": [1.0, 0.0], "bom diaa": [0.99, 0.05], "boa noite": [0.0, 1.0]}
+    cache = ChatResponseCache(max_entries=8, ttl=60, max_temperature=0.5,
+                              embed_fn=vectors.__getitem__, similarity=0.95)
+    cache.put("bom dia", "Bom dia!", **context())
+
+    assert cache.get("bom diaa", **context()) == "Bom dia!"
+    assert cache.get("boa noite", **context()) is None
+    assert cache.get("bom diaa", **context(model="outro")) is None
+    assert cache.stats()["semantic_hits"] == 1
@@ -0,0 +1,192 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import chat_engine
+from circuit_breaker import OPEN, ProviderHealth
+from chat_cache import ChatResponseCache
+from chat_engine import ChatEngine, ProviderUnavailable
+
+
+@pytest.fixture
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(chat_engine, "get_provider_health", lambda: ProviderHealth(probe_interval=60))
+
+
+@pytest.fixture
+def engine(fresh_health, monkeypatch):
+    monkeypatch.setenv("CHAT_HEDGE_SECONDS", "0.05")
+    engine = ChatEngine(http=object())
+    yield engine
+    engine._executor.shutdown(wait=True)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def race_against_stalled_ollama(engine, stalled):
+    attempts = [
+        ("ollama", "ollama", stalled),
+        ("pollinations_post", "pollinations", lambda timeout, cancel: "oi"),
+    ]
+    return engine._race(attempts)
+
+
+def test_slow_thresholds_sit_below_provider_caps(fresh_health):
+    engine = ChatEngine(http=object())
+    try:
+        ollama = engine.health.breaker("ollama")
+        pollinations = engine.health.breaker("pollinations")
+        assert ollama.slow_call_seconds < engine.ollama_timeout
+        assert pollinations.slow_call_seconds < engine.global_timeout
+    finally:
+        engine._executor.shutdown(wait=False)
+
+
+def test_calls_just_under_the_cap_open_the_circuit(engine):
+    ollama = engine.health.breaker("ollama")
+    for _ in range(ollama.min_calls):
+        ollama.record_success(engine.ollama_timeout - 0.5)
+    assert ollama.state == OPEN
+
+    pollinations = engine.health.breaker("pollinations")
+    for _ in range(pollinations.min_calls):
+        pollinations.record_success(engine.global_timeout - 1)
+    assert pollinations.state == OPEN
+
+
+def test_hung_ollama_losing_the_hedge_is_recorded_as_failure(engine):
+    ollama = engine.health.breaker("ollama")
+
+    def stalled(timeout, cancel):
+        # Socket travado: o sinal de cancelamento só é visto depois do timeout
+        cancel.wait()
+        time.sleep(0.02)
+        raise ProviderUnavailable("timeout")
+
+    for _ in range(ollama.min_calls):
+        assert race_against_stalled_ollama(engine, stalled) == "oi"
+
+    assert wait_until(lambda: ollama.state == OPEN)
+    assert engine.health.breaker("pollinations").stats()["calls"] == ollama.min_calls
+
+
+def test_late_ollama_answer_counts_as_slow(engine):
+    ollama = engine.health.breaker("ollama")
+    finished = []
+
+    def late(timeout, cancel):
+        cancel.wait()
+        time.sleep(ollama.slow_call_seconds)
+        finished.append(True)
+        return None
+
+    for _ in range(ollama.min_calls):
+        race_against_stalled_ollama(engine, late)
+
+    assert wait_until(lambda: len(finished) == ollama.min_calls)
+    assert wait_until(lambda: ollama.state == OPEN)
+
+
+def test_neutral_loser_releases_without_verdict(engine):
+    ollama = engine.health.breaker("ollama")
+    gate = threading.Event()
+
+    def quick(timeout, cancel):
+        cancel.wait()
+        gate.set()
+        return None
+
+    ollama.slow_call_seconds = 60
+    race_against_stalled_ollama(engine, quick)
+    assert gate.wait(5)
+    engine._executor.shutdown(wait=True)
+    assert ollama.stats()["calls"] == 0
+
+
+class StalledHttp:
+    """Cliente HTTP em que toda requisição trava até o timeout de leitura"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def _stall(self, timeout):
+        self.timeouts.append(timeout)
+        time.sleep(timeout)
+        raise requests.Timeout(f"read timeout={timeout}")
+
+    def post(self, url, timeout=None, **kwargs):
+        return self._stall(timeout)
+
+    def get(self, url, timeout=None, **kwargs):
+        return self._stall(timeout)
+
+
+def test_stream_shares_one_deadline_with_the_race(fresh_health, monkeypatch):
+    monkeypatch.setenv("CHAT_LATENCY_BUDGET", "1.2")
+    http = StalledHttp()
+    engine = ChatEngine(http=http)
+    try:
+        started = time.time()
+        chunks = list(engine.chat_stream("oi", provider="ollama"))
+        elapsed = time.time() - started
+    finally:
+        engine._executor.shutdown(wait=True)
+
+    # O stream do Ollama gastou o orçamento: nada de stream do Pollinations nem corrida nova
+    assert len(chunks) == 1
+    assert elapsed < 2.0
+    assert len(http.timeouts) == 1 and http.timeouts[0] <= 1.2
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+        self.encoding = "utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size=None, decode_unicode=False):
+        yield self.body
+
+
+class CountingHttp:
+    def __init__(self, body):
+        self.body = body
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        return FakeResponse(self.body)
+
+    get = post
+
+
+def test_response_cache_hits_with_default_settings(fresh_health, monkeypatch):
+    for name in ("CHAT_CACHE_MAX_TEMPERATURE", "CHAT_CACHE_SIZE", "CHAT_CACHE_TTL"):
+        monkeypatch.delenv(name, raising=False)
+    http = CountingHttp("Olá!")
+    cache = ChatResponseCache()
+    engine = ChatEngine(http=http, response_cache=cache)
+    try:
+        assert engine.chat("oi") == "Olá!"
+        assert engine.chat("Oi!") == "Olá!"
+    finally:
+        engine._executor.shutdown(wait=True)
+
+    assert http.calls == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["skipped"] == 0
@@ -0,0 +1,77 @@
+import time
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ProviderHealth
+
+
+def test_opens_after_error_threshold():
+    breaker = CircuitBreaker("p", min_calls=4, error_threshold=0.5)
+    breaker.record_success(0.1)
+    breaker.record_success(0.1)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_needs_min_calls_before_opening():
+    breaker = CircuitBreaker("p", min_calls=5)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_slow_calls_open_the_circuit():
+    breaker = CircuitBreaker("p", min_calls=3, slow_call_seconds=1, slow_threshold=0.6)
+    for _ in range(3):
+        breaker.record_success(2.0)
+    assert breaker.state == OPEN
+
+
+def test_half_open_allows_a_single_trial():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=0)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success(0.1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()["trips"] == 2
+
+
+def test_release_frees_the_half_open_trial():
+    breaker = CircuitBreaker("p", min_calls=1, open_seconds=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_probe_closes_open_circuit():
+    health = ProviderHealth(probe_interval=0.01)
+    breaker = health.register("p", probe=lambda: True, min_calls=1, open_seconds=60)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    for _ in range(200):
+        if breaker.state == CLOSED:
+            break
+        time.sleep(0.01)
+    assert breaker.state == CLOSED
+    assert health.stats()["p"]["state"] == CLOSED
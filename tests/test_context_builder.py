@@ -0,0 +1,46 @@
+from context_builder import ContextBuilder, TokenCounter
+
+
+def builder(max_tokens=100, summary_tokens=30):
+    return ContextBuilder(max_tokens=max_tokens, summary_tokens=summary_tokens,
+                          counter=TokenCounter(model_name=""), message_overhead=0)
+
+
+def turn(role, content):
+    return {"role": role, "content": content}
+
+
+def test_counts_are_cached():
+    counter = TokenCounter(model_name="")
+    assert counter.count("uma frase qualquer") == counter.count("uma frase qualquer")
+    assert counter.stats()["hits"] == 1
+    assert counter.stats()["tokenizer"] == "approximate"
+
+
+def test_fills_budget_from_most_recent():
+    history = [turn("user", "palavra " * 10), turn("assistant", "ok"), turn("user", "oi")]
+    recent, summary = builder(max_tokens=5).build(history)
+    assert [m["content"] for m in recent] == ["ok", "oi"]
+    assert summary.startswith("Usuário: palavra")
+
+
+def test_skips_invalid_and_empty_messages():
+    history = [turn("system", "x"), turn("user", "   "), "lixo", turn("assistant", "oi")]
+    recent, summary = builder().build(history)
+    assert recent == [turn("assistant", "oi")]
+    assert summary == ""
+
+
+def test_long_recent_turn_does_not_empty_the_summary():
+    long_turn = turn("assistant", " ".join(["palavra"] * 200))
+    older = [turn("user", "Pergunta antiga."), long_turn]
+    summary = builder(summary_tokens=12).summarize(older)
+    assert summary
+    assert summary.endswith("…")
+    assert TokenCounter(model_name="").count(summary) <= 12
+
+
+def test_summary_keeps_older_turns_when_one_cannot_fit():
+    b = builder(summary_tokens=6)
+    older = [turn("user", "Oi."), turn("assistant", "supercalifragilistico" * 10)]
+    assert b.summarize(older) == "Usuário: Oi."
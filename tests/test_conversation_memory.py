@@ -0,0 +1,47 @@
+from context_builder import ContextBuilder, TokenCounter
+from conversation_memory import ConversationMemory
+
+
+def make_memory(**kwargs):
+    builder = ContextBuilder(max_tokens=100, summary_tokens=50, counter=TokenCounter(model_name=""))
+    return ConversationMemory(builder=builder, **kwargs)
+
+
+def test_keeps_only_recent_turns():
+    memory = make_memory(max_turns=4, max_notes=5, summarize_every=10)
+    for n in range(6):
+        memory.append("user" if n % 2 == 0 else "assistant", f"mensagem {n}")
+
+    assert [m["content"] for m in memory.messages()] == [f"mensagem {n}" for n in range(2, 6)]
+    stats = memory.stats()
+    assert stats["turns"] == 4
+    assert stats["pending_summary"] == 2
+    assert stats["total_turns"] == 6
+    assert memory.user_turns == 3
+
+
+def test_evicted_turns_become_bounded_notes():
+    memory = make_memory(max_turns=2, max_notes=2, summarize_every=2)
+    for n in range(10):
+        memory.append("user", f"assunto {n}.")
+
+    notes = memory.notes()
+    assert len(notes) == 2
+    assert "assunto 7" in notes[-1]
+    assert memory.notes(limit=1) == notes[-1:]
+    assert memory.notes(limit=0) == []
+    assert memory.note_dicts()[-1]["turns"] == 2
+
+
+def test_page_is_newest_first():
+    memory = make_memory(max_turns=10)
+    for n in range(5):
+        memory.append("user", str(n))
+
+    items, has_more = memory.page(limit=2)
+    assert [item["content"] for item in items] == ["4", "3"]
+    assert has_more
+
+    items, has_more = memory.page(limit=2, offset=4)
+    assert [item["content"] for item in items] == ["0"]
+    assert not has_more
@@ -0,0 +1,73 @@
+import os
+
+from gallery_catalog import GalleryCatalog
+
+
+def make_catalog(tmp_path):
+    images_dir = tmp_path / "images"
+    return GalleryCatalog(str(tmp_path / "gallery.db"), str(images_dir)), images_dir
+
+
+def test_add_updates_prompt_but_keeps_creation_time(tmp_path):
+    catalog, _ = make_catalog(tmp_path)
+    catalog.add("a.png", "gato", created_at=10)
+    catalog.add("a.png", "gato preto", created_at=99)
+
+    assert catalog.entries() == [("a.png", "gato preto", 10)]
+    catalog.remove("a.png")
+    assert catalog.count() == 0
+
+
+def test_rebuild_indexes_new_files_and_drops_vanished(tmp_path):
+    catalog, images_dir = make_catalog(tmp_path)
+    (images_dir / "20240101_120000_um_gato.png").write_bytes(b"png")
+    (images_dir / "com_txt.webp").write_bytes(b"webp")
+    (images_dir / "com_txt.txt").write_text("prompt do txt", encoding="utf-8")
+    (images_dir / "notas.txt").write_text("ignorado", encoding="utf-8")
+    catalog.add("sumiu.png", "velha")
+
+    catalog.rebuild()
+
+    prompts = {filename: prompt for filename, prompt, _ in catalog.entries()}
+    assert prompts == {
+        "20240101_120000_um_gato.png": "um gato",
+        "com_txt.webp": "prompt do txt",
+    }
+
+
+def test_rebuild_uses_file_mtime(tmp_path):
+    catalog, images_dir = make_catalog(tmp_path)
+    path = images_dir / "x.png"
+    path.write_bytes(b"png")
+    os.utime(path, (1234, 1234))
+
+    catalog.rebuild()
+
+    assert catalog.entries() == [("x.png", "x.png", 1234)]
+
+
+def test_cursor_pages_newest_first_without_gaps(tmp_path):
+    catalog, _ = make_catalog(tmp_path)
+    for index in range(5):
+        catalog.add(f"{index}.png", f"p{index}", created_at=100 + index)
+    # Mesmo created_at: desempate pelo id
+    catalog.add("5.png", "p5", created_at=104)
+
+    seen = []
+    items, cursor = catalog.page(limit=2)
+    seen += [item["filename"] for item in items]
+    while cursor is not None:
+        items, cursor = catalog.page(after=cursor, limit=2)
+        seen += [item["filename"] for item in items]
+
+    assert seen == ["5.png", "4.png", "3.png", "2.png", "1.png", "0.png"]
+
+
+def test_last_page_has_no_cursor(tmp_path):
+    catalog, _ = make_catalog(tmp_path)
+    catalog.add("a.png", "a", created_at=1)
+    catalog.add("b.png", "b", created_at=2)
+
+    items, cursor = catalog.page(limit=2)
+    assert [item["filename"] for item in items] == ["b.png", "a.png"]
+    assert cursor is None
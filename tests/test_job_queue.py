@@ -0,0 +1,194 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue, QueueFullError
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def blocked_queue(max_size=3):
+    """Fila cujo worker fica preso no primeiro job até `release` ser liberado"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def handler(job):
+        started.set()
+        release.wait(5)
+        return {"status": "success", "value": job.params["n"]}
+
+    queue = JobQueue(handler, max_size=max_size)
+    running = queue.submit({"n": 0})
+    assert started.wait(5)
+    return queue, running, release
+
+
+def test_cancel_queued_job_frees_its_slot():
+    queue, _, release = blocked_queue(max_size=3)
+    try:
+        jobs = [queue.submit({"n": i}) for i in range(1, 4)]
+        with pytest.raises(QueueFullError):
+            queue.submit({"n": 99})
+
+        for job in jobs:
+            assert queue.cancel(job.id).status == "cancelled"
+
+        assert queue.stats()["pending"] == 0
+        queue.submit({"n": 4})
+        assert queue.stats()["pending"] == 1
+    finally:
+        release.set()
+
+
+def test_cancelled_job_never_runs():
+    queue, running, release = blocked_queue()
+    job = queue.submit({"n": 1})
+    after = queue.submit({"n": 2})
+    queue.cancel(job.id)
+    release.set()
+
+    assert wait_until(lambda: after.finished)
+    assert running.status == "done"
+    assert after.status == "done"
+    assert job.status == "cancelled"
+    assert job.result is None
+
+
+def test_cancel_unknown_or_finished_job():
+    queue, running, release = blocked_queue()
+    release.set()
+    assert queue.cancel("missing") is None
+    assert wait_until(lambda: running.finished)
+    assert queue.cancel(running.id).status == "done"
+
+
+class Gate:
+    """Handler que segura o worker no primeiro job e registra a ordem de execução"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.order = []
+
+    def __call__(self, job):
+        self.order.append(job.params["n"])
+        self.started.set()
+        self.release.wait(5)
+        return {"status": "success", "n": job.params["n"]}
+
+
+def test_runs_by_priority_then_arrival():
+    gate = Gate()
+    queue = JobQueue(gate, max_size=8)
+    queue.submit({"n": "first"})
+    assert gate.started.wait(5)
+
+    low = queue.submit({"n": "low"}, priority=0)
+    high = queue.submit({"n": "high"}, priority=5)
+    low_again = queue.submit({"n": "low_again"}, priority=0)
+    gate.release.set()
+
+    assert wait_until(lambda: low_again.finished)
+    assert gate.order == ["first", "high", "low", "low_again"]
+    assert high.result == {"status": "success", "n": "high"}
+    assert high.progress == 100
+
+
+def test_rejects_when_full():
+    gate = Gate()
+    queue = JobQueue(gate, max_size=2)
+    queue.submit({"n": 0})
+    assert gate.started.wait(5)
+    queue.submit({"n": 1})
+    queue.submit({"n": 2})
+    with pytest.raises(QueueFullError):
+        queue.submit({"n": 3})
+    assert queue.stats()["pending"] == 2
+    gate.release.set()
+
+
+def test_handler_errors_become_job_errors():
+    def handler(job):
+        if job.params["n"] == 1:
+            raise RuntimeError("boom")
+        return {"status": "error", "message": "sem GPU"}
+
+    queue = JobQueue(handler)
+    crashed = queue.submit({"n": 1})
+    failed = queue.submit({"n": 2})
+    assert wait_until(lambda: failed.finished)
+    assert crashed.status == "error" and crashed.error == "boom"
+    assert failed.status == "error" and failed.error == "sem GPU"
+
+
+def test_add_completed_and_pruning():
+    queue = JobQueue(lambda job: {"status": "success"}, max_finished=2)
+    jobs = [queue.add_completed({"n": n}, {"status": "success"}) for n in range(4)]
+    assert all(job.status == "done" for job in jobs)
+    assert queue.get(jobs[0].id) is None
+    assert queue.get(jobs[-1].id) is jobs[-1]
+
+
+def batching_queue(max_batch_size=3):
+    gate = Gate()
+    batches = []
+
+    def batch_handler(jobs):
+        batches.append([job.params["n"] for job in jobs])
+        return [{"status": "success", "n": job.params["n"]} for job in jobs]
+
+    queue = JobQueue(gate, max_size=16, batch_handler=batch_handler,
+                     batch_key=lambda params: params.get("key"),
+                     max_batch_size=max_batch_size, batch_window=0.05)
+    queue.submit({"n": "blocker"})
+    assert gate.started.wait(5)
+    return queue, gate, batches
+
+
+def test_compatible_jobs_run_together():
+    queue, gate, batches = batching_queue()
+    jobs = [queue.submit({"n": n, "key": "512"}) for n in range(3)]
+    gate.release.set()
+
+    assert wait_until(lambda: all(job.finished for job in jobs))
+    assert batches == [[0, 1, 2]]
+    assert [job.result["n"] for job in jobs] == [0, 1, 2]
+
+
+def test_batches_respect_key_and_size():
+    queue, gate, batches = batching_queue(max_batch_size=2)
+    jobs = [
+        queue.submit({"n": "a1", "key": "a"}),
+        queue.submit({"n": "b1", "key": "b"}),
+        queue.submit({"n": "a2", "key": "a"}),
+        queue.submit({"n": "a3", "key": "a"}),
+        queue.submit({"n": "solo"}),
+    ]
+    gate.release.set()
+
+    assert wait_until(lambda: all(job.finished for job in jobs))
+    assert ["a1", "a2"] in batches
+    assert all(len(batch) <= 2 for batch in batches)
+    assert all(len({n[0] for n in batch}) == 1 for batch in batches)
+    # Sem chave (None) nunca entra em lote
+    assert "solo" in gate.order
+
+
+def test_cancelled_jobs_are_left_out_of_batches():
+    queue, gate, batches = batching_queue()
+    keep = queue.submit({"n": 1, "key": "k"})
+    dropped = queue.submit({"n": 2, "key": "k"})
+    queue.cancel(dropped.id)
+    gate.release.set()
+
+    assert wait_until(lambda: keep.finished)
+    assert dropped.status == "cancelled"
+    assert all(2 not in batch for batch in batches)
@@ -0,0 +1,53 @@
+import os
+
+from result_cache import ResultCache
+
+
+def test_key_ignores_parameter_order():
+    assert ResultCache.key_for({"a": 1, "b": 2}) == ResultCache.key_for({"b": 2, "a": 1})
+    assert ResultCache.key_for({"a": 1}) != ResultCache.key_for({"a": 2})
+
+
+def test_put_then_get(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1024)
+    assert cache.get("k") is None
+    cache.put("k", b"image", {"format": "png", "seed": 1})
+
+    image, metadata = cache.get("k")
+    assert image == b"image"
+    assert metadata["seed"] == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_overwriting_a_key_does_not_inflate_usage(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1024)
+    for _ in range(5):
+        cache.put("k", b"x" * 100, {"format": "png"})
+    assert cache.stats()["bytes"] == 100
+
+    cache.put("k", b"x" * 40, {"format": "webp"})
+    assert cache.stats()["bytes"] == 40
+    assert not os.path.exists(cache.path_for("k", "png"))
+    assert cache.get("k")[0] == b"x" * 40
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=350)
+    for index, key in enumerate(("a", "b", "c")):
+        cache.put(key, b"x" * 100, {"format": "png"})
+        # mtime é o relógio do LRU: espaça os acessos sem depender de sleep
+        os.utime(cache.path_for(key), (index, index))
+
+    cache.get("a")  # "a" volta a ser o mais recente
+    cache.put("d", b"x" * 100, {"format": "png"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] == 300
+
+
+def test_usage_is_recomputed_from_disk(tmp_path):
+    ResultCache(str(tmp_path)).put("k", b"x" * 10, {"format": "png"})
+    assert ResultCache(str(tmp_path)).stats()["bytes"] == 10
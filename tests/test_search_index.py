@@ -0,0 +1,80 @@
+from search_index import SearchIndex
+
+
+def make_index(tmp_path):
+    return SearchIndex(str(tmp_path / "search.db"))
+
+
+def refs(items):
+    return [item["ref"] for item in items]
+
+
+def test_prefix_and_accent_insensitive_search(tmp_path):
+    index = make_index(tmp_path)
+    index.add("image", "a.png", "Pôr do sol em São Paulo")
+    index.add("image", "b.png", "praia no Rio")
+
+    items, has_more = index.search("sao pau")
+    assert refs(items) == ["a.png"]
+    assert not has_more
+    assert "[" in items[0]["snippet"]
+
+
+def test_terms_are_combined_and_punctuation_is_ignored(tmp_path):
+    index = make_index(tmp_path)
+    index.add("image", "a.png", "gato preto")
+    index.add("image", "b.png", "gato branco")
+
+    items, _ = index.search('gato "preto"')
+    assert refs(items) == ["a.png"]
+    # Operadores do FTS5 viram termos comuns, sem erro de sintaxe
+    assert index.search("gato OR") == ([], False)
+    assert index.search("   ") == ([], False)
+
+
+def test_filters_by_kind(tmp_path):
+    index = make_index(tmp_path)
+    index.add("image", "a.png", "chuva forte")
+    index.add("speech", "s.mp3", "chuva leve")
+
+    items, _ = index.search("chuva", kind="speech")
+    assert refs(items) == ["s.mp3"]
+    assert index.count() == 2
+    assert index.count("image") == 1
+
+
+def test_update_and_remove_keep_fts_in_sync(tmp_path):
+    index = make_index(tmp_path)
+    index.add("image", "a.png", "cachorro")
+    index.add("image", "a.png", "tartaruga")
+
+    assert index.search("cachorro") == ([], False)
+    assert refs(index.search("tartaruga")[0]) == ["a.png"]
+
+    index.remove("image", "a.png")
+    assert index.search("tartaruga") == ([], False)
+    assert index.count() == 0
+
+
+def test_pagination_reports_has_more(tmp_path):
+    index = make_index(tmp_path)
+    for n in range(5):
+        index.add("audio", f"{n}.wav", f"batida {n}")
+
+    first, has_more = index.search("batida", limit=3)
+    rest, more_after = index.search("batida", limit=3, offset=3)
+    assert len(first) == 3 and has_more
+    assert len(rest) == 2 and not more_after
+    assert set(refs(first)) | set(refs(rest)) == {f"{n}.wav" for n in range(5)}
+
+
+def test_sync_adds_missing_and_drops_stale(tmp_path):
+    index = make_index(tmp_path)
+    index.add("speech", "velha.mp3", "fala antiga")
+    index.add("image", "fica.png", "outro tipo")
+
+    index.sync("speech", [("nova.mp3", "fala nova", 1.0), ("vazia.mp3", "", 2.0)])
+
+    assert refs(index.search("fala")[0]) == ["nova.mp3"]
+    assert index.count("speech") == 1
+    assert index.count("image") == 1
@@ -0,0 +1,71 @@
+import json
+
+from speech_metadata import SpeechMetadataStore
+
+
+def read_log(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_put_delete_and_replay(tmp_path):
+    log_path = str(tmp_path / "meta.jsonl")
+    store = SpeechMetadataStore(log_path)
+    store.put("a.mp3", {"text": "olá"})
+    store.put("b.mp3", {"text": "tchau"})
+    store.delete("a.mp3")
+    store.close()
+
+    reopened = SpeechMetadataStore(log_path)
+    assert "a.mp3" not in reopened
+    assert reopened["b.mp3"] == {"text": "tchau"}
+    assert len(reopened) == 1
+    reopened.close()
+
+
+def test_truncated_last_line_is_ignored_and_terminated(tmp_path):
+    log_path = tmp_path / "meta.jsonl"
+    log_path.write_text(
+        json.dumps({"op": "put", "filename": "a.mp3", "meta": {"n": 1}}) + "\n" + '{"op": "put", "filen',
+        encoding='utf-8'
+    )
+
+    store = SpeechMetadataStore(str(log_path))
+    assert store.items() == [("a.mp3", {"n": 1})]
+    store.put("b.mp3", {"n": 2})
+    store.close()
+
+    reopened = SpeechMetadataStore(str(log_path))
+    assert {filename for filename, _ in reopened.items()} == {"a.mp3", "b.mp3"}
+    reopened.close()
+
+
+def test_compaction_drops_obsolete_lines(tmp_path):
+    log_path = str(tmp_path / "meta.jsonl")
+    store = SpeechMetadataStore(log_path, compact_ratio=2.0, compact_min_lines=10)
+    for n in range(50):
+        store.put("a.mp3", {"n": n})
+    store.compact()
+
+    records = read_log(log_path)
+    assert records == [{"op": "put", "filename": "a.mp3", "meta": {"n": 49}}]
+    store.put("b.mp3", {"n": 0})
+    store.close()
+    assert len(read_log(log_path)) == 2
+
+
+def test_legacy_json_is_migrated_and_left_in_place(tmp_path):
+    legacy = tmp_path / "meta.json"
+    legacy.write_text(json.dumps({"old.mp3": {"text": "antigo"}}), encoding='utf-8')
+    log_path = str(tmp_path / "meta.jsonl")
+
+    store = SpeechMetadataStore(log_path, legacy_path=str(legacy))
+    assert store["old.mp3"] == {"text": "antigo"}
+    store.delete("old.mp3")
+    store.close()
+
+    # O arquivo versionado continua lá, mas o log passa a ser a fonte da verdade
+    assert legacy.exists()
+    reopened = SpeechMetadataStore(log_path, legacy_path=str(legacy))
+    assert "old.mp3" not in reopened
+    reopened.close()
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image
+
+from thumbnails import ThumbnailStore
+
+
+def make_store(tmp_path):
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    return ThumbnailStore(str(tmp_path / "thumbs"), str(images_dir)), images_dir
+
+
+def test_generates_thumbnail_on_first_access(tmp_path):
+    store, images_dir = make_store(tmp_path)
+    Image.new("RGB", (600, 300), "red").save(images_dir / "a.png")
+
+    path = store.ensure("a.png", 200)
+
+    assert path == store.path_for("a.png", 256)
+    with Image.open(path) as thumb:
+        assert thumb.size == (256, 128)
+
+
+def test_rejects_names_that_are_not_gallery_images(tmp_path):
+    store, images_dir = make_store(tmp_path)
+    (images_dir / "a.txt").write_text("prompt", encoding="utf-8")
+    (tmp_path / "gallery.db").write_bytes(b"SQLite")
+
+    assert store.ensure("a.txt", 256) is None
+    assert store.ensure("..", 256) is None
+    assert store.ensure("../gallery.db", 256) is None
+
+
+def test_corrupt_image_returns_none(tmp_path):
+    store, images_dir = make_store(tmp_path)
+    (images_dir / "quebrada.png").write_bytes(b"not a png")
+
+    assert store.ensure("quebrada.png", 256) is None
+    assert not os.path.exists(store.path_for("quebrada.png", 256))
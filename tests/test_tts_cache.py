@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+
+from tts_cache import TTSCache, prune_files
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_key_depends_on_every_parameter():
+    base = TTSCache.key_for("oi", "voz", "-10%", "+0Hz")
+    assert base == TTSCache.key_for("oi", "voz", "-10%", "+0Hz")
+    assert base != TTSCache.key_for("oi", "voz", "+0%", "+0Hz")
+    assert base != TTSCache.key_for("oi", "outra", "-10%", "+0Hz")
+
+
+def test_miss_synthesizes_then_hits(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=1024)
+    calls = []
+
+    async def synthesize(path):
+        calls.append(path)
+        with open(path, "wb") as f:
+            f.write(b"mp3")
+
+    path, hit = run(cache.get_or_create("k", synthesize))
+    assert not hit
+    assert open(path, "rb").read() == b"mp3"
+
+    path, hit = run(cache.get_or_create("k", synthesize))
+    assert hit
+    assert len(calls) == 1
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_concurrent_misses_share_one_synthesis(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=1024)
+    calls = []
+
+    async def synthesize(path):
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        with open(path, "wb") as f:
+            f.write(b"mp3")
+
+    async def both():
+        return await asyncio.gather(
+            cache.get_or_create("k", synthesize),
+            cache.get_or_create("k", synthesize),
+        )
+
+    first, second = run(both())
+    assert first[0] == second[0]
+    assert len(calls) == 1
+
+
+def test_failed_synthesis_leaves_nothing_behind(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=1024)
+
+    async def synthesize(path):
+        with open(path, "wb") as f:
+            f.write(b"partial")
+        raise RuntimeError("rede caiu")
+
+    try:
+        run(cache.get_or_create("k", synthesize))
+    except RuntimeError:
+        pass
+    assert os.listdir(tmp_path) == []
+    assert cache.lookup("k") is None
+
+
+def test_evicts_oldest_entries(tmp_path):
+    cache = TTSCache(str(tmp_path), max_bytes=250)
+
+    def writer(size):
+        async def synthesize(path):
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+        return synthesize
+
+    for index, key in enumerate(("a", "b")):
+        run(cache.get_or_create(key, writer(100)))
+        os.utime(cache.path_for(key), (index, index))
+    run(cache.get_or_create("c", writer(100)))
+
+    assert cache.lookup("a") is None
+    assert cache.lookup("b") is not None
+    assert cache.stats()["bytes"] == 200
+
+
+def test_prune_files_by_age_then_size(tmp_path):
+    now = time.time()
+    for name, age in (("velho.mp3", 7200), ("a.mp3", 30), ("b.mp3", 20), ("c.mp3", 10)):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+
+    assert prune_files(str(tmp_path), max_age=3600, max_bytes=250) == 2
+    assert sorted(os.listdir(tmp_path)) == ["b.mp3", "c.mp3"]
+
+
+def test_prune_files_keeps_recent_files_within_budget(tmp_path):
+    (tmp_path / "novo.mp3").write_bytes(b"x" * 100)
+
+    assert prune_files(str(tmp_path), max_age=3600, max_bytes=1024) == 0
+    assert os.listdir(tmp_path) == ["novo.mp3"]
@@ -0,0 +1,87 @@
+"""
+Miniaturas da Galeria
+Gera as miniaturas (WebP) uma única vez, quando a imagem é salva,
+e guarda em disco por tamanho: thumbs/<tamanho>/<nome>.webp
+"""
+
+import os
+import threading
+
+from PIL import Image
+
+from gallery_catalog import IMAGE_EXTENSIONS
+
+THUMBNAIL_SIZES = (128, 256, 512)
+
+
+class ThumbnailStore:
+    """Cria e localiza miniaturas; imagens antigas ganham a miniatura no primeiro acesso"""
+
+    def __init__(self, thumbs_dir, images_dir, sizes=THUMBNAIL_SIZES, quality=80):
+        self.thumbs_dir = thumbs_dir
+        self.images_dir = images_dir
+        self.sizes = tuple(sorted(sizes))
+        self.quality = quality
+        self._lock = threading.Lock()
+        for size in self.sizes:
+            os.makedirs(os.path.join(self.thumbs_dir, str(size)), exist_ok=True)
+
+    def snap_size(self, size):
+        """Menor tamanho disponível que cobre o pedido (ou o maior de todos)"""
+        for available in self.sizes:
+            if size <= available:
+                return available
+        return self.sizes[-1]
+
+    def thumb_name(self, filename):
+        return os.path.splitext(filename)[0] + '.webp'
+
+    def path_for(self, filename, size):
+        return os.path.join(self.thumbs_dir, str(size), self.thumb_name(filename))
+
+    def create_all(self, image, filename):
+        """Gera todas as miniaturas de uma imagem recém-salva"""
+        for size in self.sizes:
+            self._write(image, filename, size)
+
+    def ensure(self, filename, size):
+        """
+        Caminho da miniatura, gerando a partir do original se ainda não existir.
+        None se o nome não for de uma imagem da galeria ou o arquivo não abrir como imagem.
+        """
+        if os.path.basename(filename) != filename or not filename.lower().endswith(IMAGE_EXTENSIONS):
+            return None
+        size = self.snap_size(size)
+        path = self.path_for(filename, size)
+        if os.path.exists(path):
+            return path
+
+        source = os.path.join(self.images_dir, filename)
+        if not os.path.isfile(source):
+            return None
+        with self._lock:
+            if not os.path.exists(path):
+                try:
+                    with Image.open(source) as image:
+                        self._write(image, filename, size)
+                except (OSError, ValueError) as e:
+                    print(f"Miniatura não gerada para '{filename}': {e}")
+                    return None
+        return path
+
+    def remove(self, filename):
+        for size in self.sizes:
+            try:
+                os.remove(self.path_for(filename, size))
+            except OSError:
+                pass
+
+    def _write(self, image, filename, size):
+        thumb = image.copy()
+        thumb.thumbnail((size, size))
+        if thumb.mode not in ('RGB', 'RGBA'):
+            thumb = thumb.convert('RGB')
+        path = self.path_for(filename, size)
+        tmp_path = path + '.tmp'
+        thumb.save(tmp_path, format='WEBP', quality=self.quality)
+        os.replace(tmp_path, path)
@@ -0,0 +1,166 @@
+"""
+Cache de Síntese de Fala (TTS)
+Cache em disco endereçado por conteúdo: a chave é o hash de
+(texto, voz, rate, pitch) e o valor é o MP3. Falas repetidas (mensagens
+ociosas, fallbacks, /speak iguais) não são sintetizadas de novo
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class TTSCache:
+    """
+    Guarda `<hash>.mp3` em `cache_dir`, limitado a `max_bytes`.
+    O mtime marca o último uso; a evicção remove os mais antigos (LRU).
+    Usado a partir do event loop do TTS: sínteses iguais em andamento são unificadas.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('TTS_CACHE_MB', 256)) * 1024 * 1024
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key_for(text, voice, rate, pitch):
+        payload = json.dumps([text, voice, rate, pitch], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+
+    def lookup(self, key):
+        """Caminho do áudio em cache (marcando como usado) ou None"""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    async def get_or_create(self, key, synthesize):
+        """
+        Devolve (caminho, veio_do_cache). Em caso de miss chama
+        `await synthesize(tmp_path)` e publica o arquivo atomicamente.
+        """
+        path = self.lookup(key)
+        if path is not None:
+            return path, True
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        tmp_path = f"{path or self.path_for(key)}.{uuid.uuid4().hex}.tmp"
+        try:
+            await synthesize(tmp_path)
+            path = self.path_for(key)
+            os.replace(tmp_path, path)
+            self._added(os.path.getsize(path))
+            future.set_result(path)
+            return path, False
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # evita aviso de exceção não lida sem outros interessados
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def _added(self, size):
+        with self._lock:
+            self._total_bytes += size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(mtime, nome do arquivo, tamanho) de cada áudio do cache"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.mp3'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove os menos usados até ficar abaixo de 90% do limite (chamado com o lock)"""
+        target = int(self.max_bytes * 0.9)
+        entries = sorted(self._entries())
+        self._total_bytes = sum(size for _, _, size in entries)
+        for _, name, size in entries:
+            if self._total_bytes <= target:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            self._total_bytes -= size
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def prune_files(directory, max_age=None, max_bytes=None):
+    """
+    Limpa uma pasta de áudios publicados (ex: trechos do streaming): remove os
+    mais velhos que `max_age` segundos e, se ainda passar de `max_bytes`, os
+    mais antigos até caber. Devolve quantos arquivos foram removidos.
+    """
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, path, stat.st_size))
+    entries.sort()
+
+    cutoff = time.time() - max_age if max_age is not None else None
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for mtime, path, size in entries:
+        expired = cutoff is not None and mtime < cutoff
+        oversized = max_bytes is not None and total > max_bytes
+        if not expired and not oversized:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
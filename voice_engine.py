@@ -1,10 +1,20 @@
-import asyncio
 import edge_tts
 import os
-import uuid
+import time
+
+from async_runtime import get_runtime, DEFAULT_TIMEOUT
+from tts_cache import TTSCache
+
+# Lista de vozes muda raramente; evita uma chamada HTTP a cada /get_voices
+VOICES_CACHE_SECONDS = 6 * 3600
 
 class VoiceEngine:
-    def __init__(self):
+    def __init__(self, runtime=None):
+        # Event loop compartilhado (thread próprio) para todo o TTS
+        self.runtime = runtime or get_runtime()
+        self._voices = None
+        self._voices_at = 0.0
+
         self.output_dir = "templates/static/audio_generated"
         if not os.path.exists(self.output_dir):
             os.makedirs(self.output_dir)
@@ -12,6 +22,9 @@ class VoiceEngine:
         # Default voice
         self.default_voice = "pt-BR-FranciscaNeural"
 
+        # /speak repetido (mesmo texto, voz, rate e pitch) reaproveita o MP3
+        self.cache = TTSCache(os.path.join(self.output_dir, "tts_cache"))
+
     async def _get_voices_async(self):
         """List all available voices."""
         voices = await edge_tts.list_voices()
@@ -19,15 +32,12 @@ class VoiceEngine:
         pt_voices = [v for v in voices if "pt-" in v["ShortName"]]
         return pt_voices
 
-    def get_voices(self):
-        """Synchronous wrapper to get voices."""
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        return loop.run_until_complete(self._get_voices_async())
+    def get_voices(self, timeout=DEFAULT_TIMEOUT):
+        """Synchronous wrapper to get voices (cached)."""
+        if self._voices is None or time.time() - self._voices_at > VOICES_CACHE_SECONDS:
+            self._voices = self.runtime.run(self._get_voices_async(), timeout=timeout)
+            self._voices_at = time.time()
+        return self._voices
 
     async def _generate_async(self, text, voice, rate, pitch):
         """Generate audio file from text."""
@@ -52,20 +62,15 @@ class VoiceEngine:
             if pitch_str and pitch_str[0] not in ['+', '-']:
                 pitch_str = f"+{pitch_str}"
 
-        communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str)
-        
-        filename = f"speech_{uuid.uuid4().hex}.mp3"
-        output_path = os.path.join(self.output_dir, filename)
-        
-        await communicate.save(output_path)
-        return filename
+        async def synthesize(path):
+            communicate = edge_tts.Communicate(text, voice, rate=rate_str, pitch=pitch_str)
+            await communicate.save(path)
 
-    def generate(self, text, voice=None, rate="+0%", pitch="+0Hz"):
+        key = self.cache.key_for(text, voice, rate_str, pitch_str)
+        path, _ = await self.cache.get_or_create(key, synthesize)
+        # Relative to output_dir, e.g. "tts_cache/<hash>.mp3"
+        return os.path.relpath(path, self.output_dir).replace(os.sep, "/")
+
+    def generate(self, text, voice=None, rate="+0%", pitch="+0Hz", timeout=DEFAULT_TIMEOUT):
         """Synchronous wrapper to generate audio."""
-        try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        return loop.run_until_complete(self._generate_async(text, voice, rate, pitch))
+        return self.runtime.run(self._generate_async(text, voice, rate, pitch), timeout=timeout)